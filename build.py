@@ -44,8 +44,8 @@ def filter_settings(project):
 def set_properties(project, logger):
     # dependencies
     project.build_depends_on('mock')
+    project.build_depends_on('semver')
     project.depends_on('GitPython')
-    project.depends_on('semver')
 
     # coverage
     project.set_property("coverage_reset_modules", True)
@@ -63,6 +63,11 @@ def set_properties(project, logger):
 
     # distutils
     project.set_property('distutils_commands', ['bdist_wheel'])
+    project.set_property('distutils_console_scripts', [
+        'pybuilder-semver-git-tag-monorepo = '
+        'pybuilder_semver_git_tag.monorepo:main',
+        'pybuilder-semver-git-tag-batch = '
+        'pybuilder_semver_git_tag.batch:main'])
     project.set_property('distutils_classifiers', [
         'Development Status :: 4 - Beta',
         'Environment :: Console',
@@ -0,0 +1,125 @@
+#   -*- coding: utf-8 -*-
+#
+#   Copyright 2017 Alexey Sanko
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Synthetic git repositories for benchmarks.
+Repositories are built locally with `git fast-import`, no network is needed.
+"""
+import json
+from os import path
+from shutil import rmtree
+from subprocess import PIPE, Popen, check_call
+
+FIXTURE_PARAMS_FILE = 'semver_git_tag_fixture.json'
+
+
+def _data(content):
+    return 'data %d\n%s' % (len(content.encode('utf-8')), content)
+
+
+def _commit_command(number, files, tag_number):
+    """ fast-import commit: initial commit adds all files,
+        next commits change one file and changelog on tagged commits"""
+    lines = ['commit refs/heads/master',
+             'mark :%d' % number,
+             'committer Benchmark <benchmark@example.com> %d +0000'
+             % (1500000000 + number),
+             _data('commit %d\n' % number)]
+    if number > 1:
+        lines.append('from :%d' % (number - 1))
+        changed = ['data/file_%d.txt' % (number % files)]
+    else:
+        changed = ['data/file_%d.txt' % index for index in range(files)]
+    if tag_number or number == 1:
+        changed.append('CHANGELOG.md')
+    for file_name in changed:
+        lines.append('M 644 inline %s' % file_name)
+        lines.append(_data('%s %d\n' % (file_name, number)))
+    return '\n'.join(lines) + '\n'
+
+
+def _tag_commands(number, tag_number, annotated, noise):
+    """ fast-import commands for release tag and noise tags"""
+    name = '1.%d.0' % tag_number
+    if annotated:
+        lines = ['tag %s' % name,
+                 'from :%d' % number,
+                 'tagger Benchmark <benchmark@example.com> %d +0000'
+                 % (1500000000 + number),
+                 _data('release %s\n' % name)]
+    else:
+        lines = ['reset refs/tags/%s' % name, 'from :%d' % number]
+    for index in range(noise):
+        # tags without version prefix and not SemVer tags
+        noise_name = ('other/v1.%d.%d' % (tag_number, index) if index % 2
+                      else 'deploy-%d-%d' % (tag_number, index))
+        lines.extend(['reset refs/tags/%s' % noise_name,
+                      'from :%d' % number])
+    return '\n'.join(lines) + '\n'
+
+
+def create_synthetic_repo(repo_dir, commits, tags, annotated=0.5, noise=0,    # pylint: disable=too-many-arguments
+                          files=10, untagged_tail=1):
+    """
+    Create repository with linear history
+
+    :param repo_dir: directory for new repository
+    :param commits: number of commits
+    :param tags: number of release SemVer tags `1.N.0` spread over history
+    :param annotated: share of annotated release tags
+    :param noise: number of not SemVer and other prefix tags
+                  per release tag
+    :param files: number of files into worktree
+    :param untagged_tail: number of commits after last release tag
+    """
+    check_call(['git', 'init', '-q', repo_dir])
+    tagged_commits = max(commits - untagged_tail, 1)
+    step = max(tagged_commits // max(tags, 1), 1)
+    process = Popen(['git', 'fast-import', '--quiet'], cwd=repo_dir,
+                    stdin=PIPE)
+    # commit number -> number of release tag, the last tag is 1.<tags>.0
+    tag_numbers = dict((tagged_commits - (tags - tag_number) * step,
+                        tag_number) for tag_number in range(1, tags + 1)
+                       if tagged_commits - (tags - tag_number) * step >= 1)
+    annotated_count = 0
+    for number in range(1, commits + 1):
+        tag_number = tag_numbers.get(number, 0)
+        command = _commit_command(number, files, tag_number)
+        if tag_number:
+            is_annotated = annotated_count < annotated * tag_number
+            annotated_count += is_annotated
+            command += _tag_commands(number, tag_number, is_annotated, noise)
+        process.stdin.write(command.encode('utf-8'))
+    process.stdin.close()
+    if process.wait():
+        raise RuntimeError("git fast-import failed")
+    check_call(['git', 'checkout', '-q', '-f', 'master'], cwd=repo_dir)
+
+
+def get_fixture(repo_dir, **params):
+    """ Return repository with parameters. Existing repository is reused
+        if it was built with the same parameters"""
+    params_file = path.join(repo_dir, '.git', FIXTURE_PARAMS_FILE)
+    if path.isfile(params_file):
+        with open(params_file) as params_content:
+            if json.load(params_content) == params:
+                return repo_dir
+    if path.exists(repo_dir):
+        rmtree(repo_dir)
+    create_synthetic_repo(repo_dir, **params)
+    with open(params_file, 'w') as params_content:
+        json.dump(params, params_content)
+    return repo_dir
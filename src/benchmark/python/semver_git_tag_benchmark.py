@@ -0,0 +1,223 @@
+#   -*- coding: utf-8 -*-
+#
+#   Copyright 2017 Alexey Sanko
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Benchmark suite of SemVer git tag plugin on synthetic repository
+
+Times tag collection with each reachability mode, SemVer tag seek,
+changelog check and whole plugin resolution. Results could be saved
+as baseline and compared with it: build fails on regression beyond threshold.
+Baseline numbers depend on machine, so record them on the same agent.
+
+Usage:
+    PYTHONPATH=src/main/python python \
+        src/benchmark/python/semver_git_tag_benchmark.py \
+        --baseline src/benchmark/python/baseline.json
+"""
+import argparse
+import json
+from os import path
+import sys
+from tempfile import gettempdir
+import time
+
+from pybuilder.core import Project
+
+from benchmark_fixtures import get_fixture
+from pybuilder_semver_git_tag import (
+    _check_changelog,
+    _close_sessions,
+    _get_repo_info,
+    _RepoSession,
+    _seek_last_semver_tag,
+    _seek_last_semver_tags,
+    force_semver_git_tag_plugin,
+    initialize_semver_git_tag
+)
+
+SEEK_CALLS = 100
+
+
+class _NullLogger(object):
+    """ Logger which skips all messages"""
+    def debug(self, message):
+        """ Skip message"""
+        pass
+
+    info = warn = warning = debug
+
+
+def _repo_info_case(reachability):
+    def setup(repo_dir):
+        """ Collect tags and dirty flag like release build"""
+        def run():
+            """ Benchmark body"""
+            session = _RepoSession(repo_dir)
+            repo_info = _get_repo_info(session, '', reachability, limit=2)
+            _ = repo_info.tags, repo_info.is_dirty
+            session.close()
+        return run
+    return setup
+
+
+def _seek_case(repo_dir):
+    session = _RepoSession(repo_dir)
+    tags = _get_repo_info(session, '').tags
+    session.close()
+
+    def run():
+        """ Benchmark body"""
+        for _ in range(SEEK_CALLS):
+            _seek_last_semver_tag(tags)
+    return run
+
+
+def _changelog_case(repo_dir):
+    session = _RepoSession(repo_dir)
+    tags = _get_repo_info(session, '').tags
+    last_tag, previous_tag = _seek_last_semver_tags(tags)
+
+    def run():
+        """ Benchmark body"""
+        _check_changelog(['CHANGELOG.md'], session, last_tag, tags,
+                         _NullLogger(), previous_tag)
+    return run
+
+
+def _plugin_case(**properties):
+    def setup(repo_dir):
+        """ Whole name and version resolution like on import stage"""
+        def run():
+            """ Benchmark body"""
+            project = Project(repo_dir)
+            initialize_semver_git_tag(project)
+            for key, value in properties.items():
+                project.set_property(key, value)
+            force_semver_git_tag_plugin(project, _NullLogger())
+            _close_sessions()
+        return run
+    return setup
+
+
+CASES = (
+    ('repo_info_merged', _repo_info_case('merged')),
+    ('repo_info_walk', _repo_info_case('walk')),
+    ('repo_info_top_down', _repo_info_case('top-down')),
+    ('repo_info_index', _repo_info_case('index')),
+    ('seek_last_semver_tag_x%d' % SEEK_CALLS, _seek_case),
+    ('check_changelog', _changelog_case),
+    ('plugin', _plugin_case()),
+    ('plugin_files_top_down', _plugin_case(
+        semver_git_tag_refs_backend='files',
+        semver_git_tag_reachability='top-down')),
+    ('plugin_cache', _plugin_case(semver_git_tag_cache=True)),
+    ('plugin_tag_index_top_down', _plugin_case(
+        semver_git_tag_tag_index=True,
+        semver_git_tag_reachability='top-down')),
+)
+
+
+def run_cases(repo_dir, repeat, selected=None):
+    """ Return dict case name -> best seconds of `repeat` runs after warm up"""
+    results = {}
+    for name, setup in CASES:
+        if selected and name not in selected:
+            continue
+        run = setup(repo_dir)
+        run()
+        timings = []
+        for _ in range(repeat):
+            started = time.time()
+            run()
+            timings.append(time.time() - started)
+        results[name] = min(timings)
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """ Return list of (case, seconds, baseline seconds) for regressions"""
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        base = baseline.get(name)
+        if (base is not None and seconds > base * (1 + threshold) and
+                seconds - base > min_delta):
+            regressions.append((name, seconds, base))
+    return regressions
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--commits', type=int, default=20000)
+    parser.add_argument('--tags', type=int, default=500)
+    parser.add_argument('--annotated', type=float, default=0.5,
+                        help="share of annotated tags")
+    parser.add_argument('--noise', type=int, default=2,
+                        help="not SemVer tags per release tag")
+    parser.add_argument('--files', type=int, default=1000,
+                        help="files into worktree")
+    parser.add_argument('--fixture-dir',
+                        default=path.join(gettempdir(),
+                                          'semver_git_tag_benchmark'),
+                        help="repository is reused if parameters are same")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--case', action='append',
+                        help="run only particular case")
+    parser.add_argument('--baseline', help="JSON file to compare with")
+    parser.add_argument('--save-baseline', help="JSON file to save results")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed relative slowdown (default: 0.25)")
+    parser.add_argument('--min-delta', type=float, default=0.005,
+                        help="ignored absolute slowdown in seconds")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """ Run benchmark. Exit code is 1 on regression"""
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    params = {'commits': args.commits, 'tags': args.tags,
+              'annotated': args.annotated, 'noise': args.noise,
+              'files': args.files}
+    repo_dir = get_fixture(args.fixture_dir, **params)
+    results = run_cases(repo_dir, args.repeat, args.case)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as baseline_content:
+            baseline_report = json.load(baseline_content)
+        if baseline_report['params'] != params:
+            sys.stderr.write("Baseline was recorded with other fixture "
+                             "parameters: %s\n" % baseline_report['params'])
+            return 1
+        baseline = baseline_report['results']
+    for name, seconds in sorted(results.items()):
+        base = baseline.get(name)
+        print("%-28s %9.4f s%s" % (
+            name, seconds,
+            "  (baseline %.4f s, %+.0f%%)" % (base, (seconds / base - 1) * 100)
+            if base else ''))
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_content:
+            json.dump({'params': params, 'results': results},
+                      baseline_content, indent=2, sort_keys=True)
+            baseline_content.write('\n')
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    for name, seconds, base in regressions:
+        sys.stderr.write("Regression: %s took %.4f s, baseline %.4f s\n"
+                         % (name, seconds, base))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
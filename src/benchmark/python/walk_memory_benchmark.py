@@ -0,0 +1,88 @@
+#   -*- coding: utf-8 -*-
+#
+#   Copyright 2017 Alexey Sanko
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+Memory benchmark of history walk (`semver_git_tag_reachability=walk`)
+
+Creates synthetic repository (see benchmark_fixtures) and measures
+peak Python memory of walk with GitPython commits (previous implementation)
+and of streamed `git rev-list` walk.
+
+Usage (Python 3.4+ for tracemalloc):
+    PYTHONPATH=src/main/python python \
+        src/benchmark/python/walk_memory_benchmark.py --commits 1000000
+"""
+import argparse
+from shutil import rmtree
+import sys
+from tempfile import mkdtemp
+import time
+import tracemalloc
+
+import git
+
+from benchmark_fixtures import create_synthetic_repo
+from pybuilder_semver_git_tag import _get_reachable_tag_names_by_walk
+
+
+def walk_with_commit_objects(repo, tag_commits):
+    """ Previous implementation: set of hexsha for whole history"""
+    branch_commits_hexsha = set()
+    for comm in repo.iter_commits(repo.head):
+        branch_commits_hexsha.add(comm.hexsha)
+    return set(name for name, commit in tag_commits.items()
+               if commit in branch_commits_hexsha)
+
+
+def measure(function, *args):
+    """ Return (result, peak memory in bytes, seconds)"""
+    tracemalloc.start()
+    started = time.time()
+    result = function(*args)
+    seconds = time.time() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak, seconds
+
+
+def main(argv):
+    """ Run benchmark"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--commits', type=int, default=100000)
+    parser.add_argument('--tags', type=int, default=100)
+    args = parser.parse_args(argv)
+    repo_dir = mkdtemp()
+    try:
+        create_synthetic_repo(repo_dir, args.commits, args.tags, files=1)
+        repo = git.Repo(repo_dir)
+        tag_commits = dict((tag.name, tag.commit.hexsha) for tag in repo.tags)
+        # not reachable tag forces walk of whole history
+        tag_commits['9.9.9'] = '0' * 40
+        for name, function in (
+                ('GitPython commits', walk_with_commit_objects),
+                ('streamed rev-list', _get_reachable_tag_names_by_walk)):
+            result, peak, seconds = measure(function, repo, tag_commits)
+            print("%-20s commits: %d, reachable tags: %d, "
+                  "peak memory: %.1f MiB, time: %.2f s"
+                  % (name, args.commits, len(result),
+                     peak / 1024.0 / 1024.0, seconds))
+        repo.close()
+    finally:
+        rmtree(repo_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
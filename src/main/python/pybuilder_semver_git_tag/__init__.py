@@ -17,20 +17,29 @@
 """
     Plugin which provides dynamic project version based on SemVer git tag
 """
+from binascii import hexlify, unhexlify
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from heapq import merge
+from operator import attrgetter
 from os import path
+import hashlib
+import json
+import re
 import sys
+from tempfile import TemporaryFile
+import time
+import zlib
 try:
     from urlparse import urlparse
 except ImportError:
     from urllib.parse import urlparse
 
-import git
 import os
-from pybuilder.core import before, init, use_plugin
+from pybuilder.core import before, finalize, init, use_plugin
 from pybuilder.plugins.python.core_plugin import DISTRIBUTION_PROPERTY
 from pybuilder.errors import BuildFailedException
 from pybuilder.reactor import Reactor
-import semver
 
 from pybuilder_semver_git_tag import version
 
@@ -45,78 +54,1393 @@ DEFAULT_PROPERTIES = {
     'semver_git_tag_increment_part': 'patch',
     'semver_git_tag_repo_dir': None,
     'semver_git_tag_version_prefix': '',
-    'semver_git_tag_changelog': None
+    'semver_git_tag_changelog': None,
+    'semver_git_tag_reachability': 'merged',
+    'semver_git_tag_cache': False,
+    'semver_git_tag_refs_backend': 'gitpython',
+    'semver_git_tag_dirty_check': 'index-and-worktree',
+    'semver_git_tag_dirty_check_status': False,
+    'semver_git_tag_lazy': False,
+    'semver_git_tag_version': None,
+    'semver_git_tag_ci_metadata': False,
+    'semver_git_tag_shallow_strategy': 'off',
+    'semver_git_tag_resident': False,
+    'semver_git_tag_project_name': None,
+    'semver_git_tag_tag_index': False,
+    'semver_git_tag_peel_batch_size': 0,
+    'semver_git_tag_peel_fallback': 'per-tag'
 }
+REACHABILITY_MODES = ('merged', 'walk', 'top-down', 'index')
+REFS_BACKENDS = ('gitpython', 'files')
+DIRTY_CHECK_MODES = ('index-and-worktree', 'index-only', 'full', 'off')
+SHALLOW_STRATEGIES = ('off', 'deepen', 'date')
+# what to do if tags can't be peeled with `git cat-file --batch-check`
+PEEL_FALLBACKS = ('per-tag', 'fail')
+# first depth for `git fetch --deepen`, it's doubled on each attempt
+SHALLOW_DEEPEN_START = 64
+# depth 64 * 2 ** 9 = 32768 commits for the last attempt
+SHALLOW_DEEPEN_ATTEMPTS = 10
+VERSION_ENV_VARIABLE = 'SEMVER_GIT_TAG_VERSION'
+# environment variables of CI servers with tag which is built
+CI_TAG_VARIABLES = (
+    'CI_COMMIT_TAG',    # GitLab
+    'TAG_NAME',         # Jenkins
+    'TRAVIS_TAG',       # Travis CI
+    'BUILDKITE_TAG',    # Buildkite
+)
 SAVED_PROP_SUFFIX = '_on_import'
+CACHE_FILE_NAME = 'semver_git_tag_cache.json'
+METRICS_REPORT_FILE_NAME = 'semver_git_tag_metrics.json'
+CACHE_FORMAT_VERSION = 1
+REACHABILITY_INDEX_FILE = 'semver_git_tag_reachability.idx'
+TAG_INDEX_FILE = 'semver_git_tag_tags.json'
+TAG_INDEX_FORMAT = 1
+REACHABILITY_INDEX_MAGIC = b'SGTRIDX1'
+SHA_SIZE = 20
+# SemVer 2.0.0, https://semver.org/#backusnaur-form-grammar-for-valid-semver-versions
+SEMVER_REGEX = re.compile(r"""
+    ^
+    (?P<major>0|[1-9][0-9]*)
+    \.
+    (?P<minor>0|[1-9][0-9]*)
+    \.
+    (?P<patch>0|[1-9][0-9]*)
+    (?:-(?P<prerelease>
+        (?:0|[1-9][0-9]*|[0-9]*[A-Za-z-][0-9A-Za-z-]*)
+        (?:\.(?:0|[1-9][0-9]*|[0-9]*[A-Za-z-][0-9A-Za-z-]*))*
+    ))?
+    (?:\+(?P<build>
+        [0-9A-Za-z-]+
+        (?:\.[0-9A-Za-z-]+)*
+    ))?
+    $
+    """, re.VERBOSE)
+
+
+def _import_git():
+    """ GitPython is imported on first git operation only:
+        its import is expensive and isn't needed if version is known"""
+    import git
+    return git
 
 
 def _add_dev(project_version):
     return project_version + '.dev'
 
 
+def _get_short(name, version_prefix):
+    """ Return short form of tag name - without version prefix.
+        Empty string if tag hasn't version prefix"""
+    if version_prefix:
+        if str(name).startswith(version_prefix):
+            return str(name).replace(version_prefix, '', 1)
+        return ''
+    return name
+
+
+def _get_semver_key(short):
+    """ Parse SemVer once into comparable key:
+        (major, minor, patch, pre-release key).
+        Release is greater than any its pre-release, numeric identifiers
+        are lower than alphanumeric ones. Return None if it isn't SemVer"""
+    match = SEMVER_REGEX.match(short)
+    if not match:
+        return None
+    prerelease = match.group('prerelease')
+    if prerelease:
+        prerelease_key = (0, tuple(
+            (0, int(part), '') if part.isdigit() else (1, 0, part)
+            for part in prerelease.split('.')))
+    else:
+        prerelease_key = (1, ())
+    return (int(match.group('major')), int(match.group('minor')),
+            int(match.group('patch')), prerelease_key)
+
+
 class _TagInfo(object):     # pylint: disable=too-few-public-methods
+    __slots__ = ('name', 'commit', 'short', 'semver_key')
+
     def __init__(self, name, commit, version_prefix):
         self.name = name
         self.commit = commit
-        self._version_prefix = version_prefix
+        # short form of tag name - without version prefix
+        self.short = _get_short(name, version_prefix)
+        self.semver_key = _get_semver_key(self.short) if self.short else None
 
-    @property
-    def short(self):
-        """ Return short form of tag name - without version prefix"""
-        if self._version_prefix:
-            if str(self.name).startswith(self._version_prefix):
-                return str(self.name).replace(self._version_prefix, '', 1)
-            return ''
-        return self.name
+
+_REPO_CLASSES = {}
+
+
+def _get_repo_class():
+    """ git.Repo which git command wrapper counts started git processes.
+        Classes are created on first use: GitPython is imported lazily"""
+    if 'repo' not in _REPO_CLASSES:
+        git = _import_git()
+
+        class _CountingGit(git.Git):    # pylint: disable=abstract-method
+            """ Git command wrapper which counts `execute` calls
+                into _Metrics set by `count_git_processes`"""
+            __slots__ = ('metrics',)
+
+            def __init__(self, working_dir=None):
+                super(_CountingGit, self).__init__(working_dir)
+                self.metrics = None
+
+            def execute(self, command, *args, **kwargs):    # pylint: disable=arguments-differ
+                """ Count git process and run it"""
+                if self.metrics is not None:
+                    self.metrics.count('git_processes')
+                return super(_CountingGit, self).execute(
+                    command, *args, **kwargs)
+
+        class _CountingRepo(git.Repo):
+            """ git.Repo with counting git command wrapper"""
+            GitCommandWrapperType = _CountingGit
+
+        _REPO_CLASSES['repo'] = _CountingRepo
+    return _REPO_CLASSES['repo']
 
 
 def _get_repo(repo_path):
+    git = _import_git()
     try:
-        repo = git.Repo(repo_path)
+        repo = _get_repo_class()(repo_path)
     except (git.InvalidGitRepositoryError, git.NoSuchPathError):
         raise BuildFailedException("Directory `%s` isn't git repository root."
                                    % repo_path)
     return repo
 
 
-def _get_repo_info(repo_path, version_prefix):
+def _get_git_dir(repo_path):
+    """ Return path to git directory of repository
+        without calling git (`.git` could be file for worktrees)"""
+    git_dir = path.join(repo_path, '.git')
+    if path.isfile(git_dir):
+        with open(git_dir) as git_file:
+            content = git_file.read().strip()
+        if content.startswith('gitdir:'):
+            git_dir = path.normpath(path.join(
+                repo_path, content[len('gitdir:'):].strip()))
+    if not path.isdir(git_dir):
+        raise BuildFailedException("Directory `%s` isn't git repository root."
+                                   % repo_path)
+    return git_dir
+
+
+class _Metrics(object):
+    """ Timers of resolution phases and counters of git work.
+        Phases `name` and `version` cover whole resolution,
+        other phases are nested into them"""
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+        # wall-clock seconds while any phase is timed
+        self.total = 0.0
+        self._active = 0
+        self._started = None
+
+    @contextmanager
+    def timer(self, phase):
+        """ Add time of block to phase timer"""
+        started = time.time()
+        if not self._active:
+            self._started = started
+        self._active += 1
+        try:
+            yield
+        finally:
+            finished = time.time()
+            self.timers[phase] = (self.timers.get(phase, 0.0) +
+                                  finished - started)
+            self._active -= 1
+            if not self._active:
+                # nested phases are counted once
+                self.total += finished - self._started
+
+    def count(self, counter, value=1):
+        """ Increase counter"""
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def count_git_processes(self, repo):
+        """ Count git processes started by GitPython for repository
+            opened by `_get_repo`: its git command wrapper counts them"""
+        repo.git.metrics = self
+
+    def as_dict(self):
+        """ Report with seconds of phases and counters"""
+        return {'total': round(self.total, 6),
+                'timers': dict((phase, round(seconds, 6))
+                               for phase, seconds in self.timers.items()),
+                'counters': dict(self.counters)}
+
+    def __str__(self):
+        return "%.3f s. Phases: %s. Counters: %s." % (
+            self.total,
+            ', '.join('%s %.3f s' % item for item in sorted(self.timers.items())),
+            ', '.join('%s %d' % item for item in sorted(self.counters.items())))
+
+
+class _RepoSession(object):
+    """ Per-build repository session.
+        Owns one git.Repo with its child processes and closes them together"""
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self._repo = None
+        self._git_dir = None
+        # details of last version resolution: source, tag, sha and dirty flag
+        self.resolution = None
+        self.metrics = _Metrics()
+        # tags per `git cat-file` process (0 - all), fallback on its failure
+        self.peel_batch_size = 0
+        self.peel_fallback = PEEL_FALLBACKS[0]
+        # read tags with persistent tag index
+        self.use_tag_index = False
+
+    @property
+    def repo(self):
+        """ Lazily opened git.Repo"""
+        if self._repo is None:
+            with self.metrics.timer('repo_open'):
+                self._repo = _get_repo(self.repo_path)
+            self.metrics.count_git_processes(self._repo)
+        return self._repo
+
+    @property
+    def git_dir(self):
+        """ Git directory path resolved without calling git"""
+        if self._git_dir is None:
+            self._git_dir = _get_git_dir(self.repo_path)
+        return self._git_dir
+
+    def close(self):
+        """ Close repository and terminate its git processes"""
+        if self._repo is not None:
+            self._repo.close()
+            self._repo = None
+
+
+_SESSIONS = {}
+
+
+def _get_session(repo_path):
+    """ Return build session for repository, open new one if needed"""
+    if repo_path not in _SESSIONS:
+        _SESSIONS[repo_path] = _RepoSession(repo_path)
+    return _SESSIONS[repo_path]
+
+
+def _close_sessions():
+    """ Close all build sessions"""
+    while _SESSIONS:
+        _SESSIONS.popitem()[1].close()
+
+
+def _get_common_dir(git_dir):
+    """ Return directory with shared refs (differs from git dir for worktrees)"""
+    commondir_file = path.join(git_dir, 'commondir')
+    if path.isfile(commondir_file):
+        with open(commondir_file) as commondir:
+            return path.normpath(path.join(git_dir, commondir.read().strip()))
+    return git_dir
+
+
+def _read_packed_ref(common_dir, ref_name):
+    """ Seek ref into packed-refs file"""
+    packed_refs = path.join(common_dir, 'packed-refs')
+    if not path.isfile(packed_refs):
+        return None
+    with open(packed_refs) as packed_file:
+        for line in packed_file:
+            parts = line.strip().split(' ', 1)
+            if len(parts) == 2 and parts[1] == ref_name:
+                return parts[0]
+    return None
+
+
+def _read_head_sha(git_dir):
+    """ Resolve HEAD commit sha by reading files into git directory"""
+    with open(path.join(git_dir, 'HEAD')) as head_file:
+        head = head_file.read().strip()
+    common_dir = _get_common_dir(git_dir)
+    # symbolic refs could be nested
+    for _ in range(5):
+        if not head.startswith('ref:'):
+            return head
+        ref_name = head[len('ref:'):].strip()
+        head = None
+        for ref_dir in (git_dir, common_dir):
+            ref_file = path.join(ref_dir, ref_name)
+            if path.isfile(ref_file):
+                with open(ref_file) as ref_content:
+                    head = ref_content.read().strip()
+                break
+        if head is None:
+            return _read_packed_ref(common_dir, ref_name)
+    return None
+
+
+def _get_tag_refs_digest(git_dir):
+    """ Calculate digest of packed-refs file and loose tag refs"""
+    common_dir = _get_common_dir(git_dir)
+    digest = hashlib.sha1()
+    packed_refs = path.join(common_dir, 'packed-refs')
+    if path.isfile(packed_refs):
+        with open(packed_refs, 'rb') as packed_file:
+            digest.update(packed_file.read())
+    tags_dir = path.join(common_dir, 'refs', 'tags')
+    for root, dirs, files in os.walk(tags_dir):
+        dirs.sort()
+        for file_name in sorted(files):
+            ref_file = path.join(root, file_name)
+            digest.update(path.relpath(ref_file, tags_dir).encode('utf-8'))
+            with open(ref_file, 'rb') as ref_content:
+                digest.update(ref_content.read())
+    return digest.hexdigest()
+
+
+def _read_shallow(git_dir):
+    """ Return content of `shallow` file with boundary commits
+        of shallow clone. Empty string for full clone"""
+    try:
+        with open(path.join(_get_common_dir(git_dir), 'shallow')) as shallow:
+            return shallow.read()
+    except (IOError, OSError):
+        return ''
+
+
+def _is_shallow(session):
+    """ Check that repository is shallow clone"""
+    return bool(_read_shallow(session.git_dir))
+
+
+def _get_cache_key(git_dir, head_sha, project):
+    """ Key for version cache: HEAD, tag refs, shallow boundary
+        and version-related properties"""
+    key_parts = [CACHE_FORMAT_VERSION, head_sha, _get_tag_refs_digest(git_dir),
+                 hashlib.sha1(
+                     _read_shallow(git_dir).encode('utf-8')).hexdigest()]
+    # changelog check needs previous release tag: with `top-down`
+    # number of collected tags depends on it
+    for key in ('semver_git_tag_version_prefix',
+                'semver_git_tag_increment_part',
+                'semver_git_tag_reachability',
+                'semver_git_tag_shallow_strategy',
+                'semver_git_tag_changelog'):
+        key_parts.append(project.get_property(key))
+    return hashlib.sha1(
+        json.dumps(key_parts).encode('utf-8')).hexdigest()
+
+
+def _load_version_cache(cache_file, cache_key):
+    """ Return cached resolution if cache key matches, otherwise None"""
+    cache = _load_json_file(cache_file)
+    if not isinstance(cache, dict) or cache.get('key') != cache_key:
+        return None
+    return cache
+
+
+def _save_json_file(file_path, data):
+    """ Save cache or index file. They are optional - ignore errors"""
+    tmp_file = file_path + '.tmp'
+    try:
+        with open(tmp_file, 'w') as json_content:
+            json.dump(data, json_content)
+        if path.exists(file_path):
+            os.remove(file_path)
+        os.rename(tmp_file, file_path)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def _load_json_file(file_path):
+    """ Load cache or index file. None if it's absent or broken"""
+    try:
+        with open(file_path) as json_content:
+            return json.load(json_content)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _stat_signature(file_path):
+    """ Stat of file which changes on rewrite: git replaces refs
+        with lock file rename, so inode changes too"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size,
+            stat.st_ino)
+
+
+def _get_refs_stamp(git_dir):
+    """ Stat signatures of files which could change version resolution:
+        HEAD, current branch ref, packed-refs, loose tag refs
+        and shallow boundary. Only HEAD content is read"""
+    common_dir = _get_common_dir(git_dir)
+    file_paths = [path.join(git_dir, 'HEAD'),
+                  path.join(common_dir, 'packed-refs'),
+                  path.join(common_dir, 'shallow')]
+    with open(file_paths[0]) as head_file:
+        head = head_file.read().strip()
+    if head.startswith('ref:'):
+        ref_name = head[len('ref:'):].strip()
+        file_paths.extend([path.join(git_dir, ref_name),
+                           path.join(common_dir, ref_name)])
+    tags_dir = path.join(common_dir, 'refs', 'tags')
+    for root, dir_names, file_names in os.walk(tags_dir):
+        dir_names.sort()
+        file_paths.append(root)
+        file_paths.extend(path.join(root, name) for name in sorted(file_names))
+    return tuple((file_path, _stat_signature(file_path))
+                 for file_path in file_paths)
+
+
+def _get_resident_key(project):
+    """ Version-related properties of resident resolution"""
+    return json.dumps([project.get_property(key) for key in (
+        'semver_git_tag_version_prefix',
+        'semver_git_tag_increment_part',
+        'semver_git_tag_reachability',
+        'semver_git_tag_shallow_strategy',
+        'semver_git_tag_changelog',
+        'semver_git_tag_refs_backend')])
+
+
+# repository path -> last resolution of resident resolver
+_RESIDENT = {}
+
+
+def _clear_resident():
+    """ Forget all resident resolutions"""
+    _RESIDENT.clear()
+
+
+def _get_hexsha(commit):
+    """ Commit could be GitPython object or hexsha string"""
+    return getattr(commit, 'hexsha', commit)
+
+
+def _read_packed_tag_refs(common_dir):
+    """ Read tag refs from `packed-refs`.
+        Return dict tag name -> (object sha, peeled commit sha)"""
+    tag_refs = {}
+    packed_refs = path.join(common_dir, 'packed-refs')
+    if path.isfile(packed_refs):
+        # with `peeled` trait annotated tags always have `^` line
+        is_peeled = False
+        last_tag = None
+        with open(packed_refs) as packed_file:
+            for line in packed_file:
+                line = line.strip()
+                if line.startswith('#'):
+                    is_peeled = 'peeled' in line.split(':', 1)[-1].split()
+                elif line.startswith('^'):
+                    if last_tag:
+                        tag_refs[last_tag] = (tag_refs[last_tag][0], line[1:])
+                elif line:
+                    sha, ref_name = line.split(' ', 1)
+                    last_tag = None
+                    if ref_name.startswith('refs/tags/'):
+                        last_tag = ref_name[len('refs/tags/'):]
+                        tag_refs[last_tag] = (sha, sha if is_peeled else None)
+    return tag_refs
+
+
+def _read_loose_ref(ref_file):
+    """ Object sha of loose ref or None for symbolic and broken refs"""
+    with open(ref_file) as ref_content:
+        sha = ref_content.read().strip()
+    return sha if len(sha) == 40 else None
+
+
+def _read_tag_refs(git_dir):
+    """
+    Read tag refs from `packed-refs` and loose refs without git
+
+    :param git_dir: path to git directory
+    :return: dict tag name -> (object sha, peeled commit sha)
+             peeled commit sha is None if it can't be taken from refs
+    """
+    common_dir = _get_common_dir(git_dir)
+    tag_refs = _read_packed_tag_refs(common_dir)
+    # loose refs override packed ones
+    tags_dir = path.join(common_dir, 'refs', 'tags')
+    for root, _, files in os.walk(tags_dir):
+        for file_name in files:
+            ref_file = path.join(root, file_name)
+            sha = _read_loose_ref(ref_file)
+            if sha:
+                tag_name = path.relpath(ref_file, tags_dir).replace(os.sep, '/')
+                tag_refs[tag_name] = (sha, None)
+    return tag_refs
+
+
+def _peel_loose_object(common_dir, sha):
+    """ Peel object to commit sha by reading loose objects.
+        Return None if object isn't available as loose object"""
+    # annotated tag could point to another tag
+    for _ in range(10):
+        object_file = path.join(common_dir, 'objects', sha[:2], sha[2:])
+        if not path.isfile(object_file):
+            return None
+        with open(object_file, 'rb') as object_content:
+            # header and first line of object are enough
+            data = zlib.decompressobj().decompress(object_content.read(4096))
+        header, _, body = data.partition(b'\0')
+        object_type = header.split(b' ', 1)[0]
+        if object_type == b'commit':
+            return sha
+        if object_type != b'tag' or not body.startswith(b'object '):
+            return None
+        sha = body.split(b'\n', 1)[0][len(b'object '):].decode('ascii')
+    return None
+
+
+def _get_tag_refs(session, backend):
+    """ Return dict tag name -> tag reference of particular backend"""
+    repo = session.repo if backend != 'files' else None
+    with session.metrics.timer('tag_listing'):
+        if backend == 'files':
+            tag_refs = _read_tag_refs(session.git_dir)
+        else:
+            tag_refs = dict((tag.name, tag) for tag in repo.tags)
+    session.metrics.count('tags_seen', len(tag_refs))
+    return tag_refs
+
+
+def _peel_objects_in_batch(session, shas):
+    """
+    Peel objects to commits with `git cat-file --batch-check`:
+    one process and one pass per `session.peel_batch_size` objects
+
+    :return: dict object sha -> commit sha. Objects which can't be
+             peeled to commit are absent
+    """
+    batch_size = session.peel_batch_size or len(shas)
+    result = {}
+    for start in range(0, len(shas), batch_size):
+        batch = shas[start:start + batch_size]
+        # input is passed as file, so process can't block on full pipes
+        with TemporaryFile() as input_file:
+            input_file.write(''.join(
+                '%s^{commit}\n' % sha for sha in batch).encode('ascii'))
+            input_file.seek(0)
+            output = session.repo.git.cat_file(
+                '--batch-check=%(objectname) %(objecttype)',
+                istream=input_file)
+        # line per input object: `<sha> commit` or `<input> missing`
+        for sha, line in zip(batch, output.splitlines()):
+            parts = line.split()
+            if len(parts) == 2 and parts[1] == 'commit':
+                result[sha] = parts[0]
+    return result
+
+
+def _peel_object(session, sha):
+    """ Return commit sha for object with persistent GitPython process"""
+    git = _import_git()
+    try:
+        return session.repo.commit(sha).hexsha
+    except (ValueError, git.exc.ODBError, git.GitCommandError) as exc:
+        raise BuildFailedException(
+            "Tag object %s couldn't be peeled to commit: %s" % (sha, exc))
+
+
+def _peel_packed_objects(session, shas):
+    """ Return dict object sha -> commit sha for objects
+        which couldn't be peeled from loose objects"""
+    if len(shas) < 2:
+        # persistent GitPython process is cheaper for single object
+        return dict((sha, _peel_object(session, sha)) for sha in shas)
+    try:
+        result = _peel_objects_in_batch(session, shas)
+    except _import_git().GitCommandError as exc:
+        if session.peel_fallback == 'fail':
+            raise BuildFailedException(
+                "Tags couldn't be peeled with `git cat-file --batch-check`: "
+                "%s" % exc)
+        result = {}
+    missing = [sha for sha in shas if sha not in result]
+    if missing and session.peel_fallback == 'fail':
+        raise BuildFailedException(
+            "Tag objects couldn't be peeled to commits: %s"
+            % ', '.join(missing))
+    for sha in missing:
+        result[sha] = _peel_object(session, sha)
+    return result
+
+
+def _peel_tag_refs(session, backend, tag_refs, names):
+    """ Return dict tag name -> tag commit for selected tags"""
+    result = {}
+    packed_names = []
+    for name in names:
+        if backend != 'files':
+            result[name] = tag_refs[name].commit
+            continue
+        sha, commit = tag_refs[name]
+        if commit is None:
+            commit = _peel_loose_object(
+                _get_common_dir(session.git_dir), sha)
+        if commit is None:
+            # object is packed - ask git
+            packed_names.append(name)
+        result[name] = commit
+    if packed_names:
+        shas = sorted(set(tag_refs[name][0] for name in packed_names))
+        session.metrics.count('tags_peeled_by_git', len(shas))
+        commits = _peel_packed_objects(session, shas)
+        for name in packed_names:
+            result[name] = commits[tag_refs[name][0]]
+    return result
+
+
+class _TagIndex(object):
+    """
+    Persistent index of SemVer tag refs into git directory.
+    Tags are append-mostly, so each build reads only changed refs:
+    `packed-refs` is parsed only if its stat was changed, loose refs
+    are read only if they are new or their stat was changed.
+    Index keeps refs and peeled commits of SemVer tags only,
+    names of other tags and SemVer tags sorted from the highest version,
+    so only new tag names are parsed.
+    """
+    def __init__(self, session, version_prefix):
+        self.session = session
+        self.index_file = path.join(session.git_dir, TAG_INDEX_FILE)
+        self.version_prefix = version_prefix
+        self.changed = False
+        index = _load_json_file(self.index_file)
+        if (not isinstance(index, dict) or
+                index.get('format') != TAG_INDEX_FORMAT or
+                index.get('prefix') != version_prefix):
+            index = {'format': TAG_INDEX_FORMAT, 'prefix': version_prefix,
+                     'packed_stamp': None, 'packed_count': 0, 'packed': {},
+                     'loose': {}, 'ignored': [], 'semver': []}
+        self.index = index
+        self._candidates = set(index['semver'])
+        self._ignored = set(index['ignored'])
+        self.tag_refs = self._refresh()
+        self.candidates = self._update_candidates()
+
+    @property
+    def tags_count(self):
+        """ Number of tags (loose refs which override packed ones
+            are counted twice)"""
+        return self.index['packed_count'] + len(self.index['loose'])
+
+    def _is_candidate(self, name):
+        """ Check that tag has version prefix and is SemVer.
+            Only unknown names are parsed"""
+        if name in self._candidates:
+            return True
+        if name in self._ignored:
+            return False
+        short = _get_short(name, self.version_prefix)
+        if short and _get_semver_key(short):
+            self._candidates.add(name)
+            return True
+        self._ignored.add(name)
+        self.changed = True
+        return False
+
+    def _refresh(self):
+        """ Read changed refs, return dict SemVer tag name ->
+            (object sha, peeled commit sha)"""
+        common_dir = _get_common_dir(self.session.git_dir)
+        index = self.index
+        # peeled commits of known objects survive `git pack-refs`
+        known = dict((entry[-2], entry[-1])
+                     for entries in (index['packed'], index['loose'])
+                     for entry in entries.values() if entry[-1])
+        refs_read = 0
+        packed_stamp = _stat_signature(path.join(common_dir, 'packed-refs'))
+        packed_stamp = list(packed_stamp) if packed_stamp else None
+        if packed_stamp != index['packed_stamp']:
+            packed = _read_packed_tag_refs(common_dir)
+            refs_read += len(packed)
+            # forget names of deleted tags
+            self._ignored.intersection_update(packed)
+            index['packed'] = dict(
+                (name, [sha, commit or known.get(sha)])
+                for name, (sha, commit) in packed.items()
+                if self._is_candidate(name))
+            index['packed_stamp'] = packed_stamp
+            index['packed_count'] = len(packed)
+            self.changed = True
+        loose = {}
+        tags_dir = path.join(common_dir, 'refs', 'tags')
+        for root, _, files in os.walk(tags_dir):
+            for file_name in files:
+                ref_file = path.join(root, file_name)
+                tag_name = path.relpath(ref_file, tags_dir).replace(os.sep, '/')
+                stamp = list(_stat_signature(ref_file) or ())
+                entry = index['loose'].get(tag_name)
+                if entry and entry[0] == stamp:
+                    loose[tag_name] = entry
+                    continue
+                sha = _read_loose_ref(ref_file)
+                refs_read += 1
+                if sha:
+                    loose[tag_name] = [stamp, sha, known.get(sha)]
+                self.changed = True
+        if set(loose) != set(index['loose']):
+            self.changed = True
+        index['loose'] = loose
+        self.session.metrics.count('tag_refs_read', refs_read)
+        tag_refs = dict((name, tuple(entry))
+                        for name, entry in index['packed'].items())
+        # loose refs override packed ones
+        tag_refs.update((name, tuple(entry[1:]))
+                        for name, entry in loose.items()
+                        if self._is_candidate(name))
+        return tag_refs
+
+    def _update_candidates(self):
+        """ Names of SemVer tags from the highest version.
+            New tags are inserted with binary search"""
+        candidates = self.index['semver']
+        existing = set(candidates)
+        if (len(existing) == len(self.tag_refs) and
+                existing.issuperset(self.tag_refs)):
+            return candidates
+        keys = {}
+
+        def get_key(name):
+            """ SemVer key is parsed only for compared tags"""
+            if name not in keys:
+                keys[name] = _get_semver_key(
+                    _get_short(name, self.version_prefix))
+            return keys[name]
+        candidates = [name for name in candidates if name in self.tag_refs]
+        for name in self.tag_refs:
+            if name in existing:
+                continue
+            low, high = 0, len(candidates)
+            while low < high:
+                middle = (low + high) // 2
+                if get_key(candidates[middle]) > get_key(name):
+                    low = middle + 1
+                else:
+                    high = middle
+            candidates.insert(low, name)
+        self._candidates = set(candidates)
+        self.index['semver'] = candidates
+        self.changed = True
+        return candidates
+
+    def set_peeled(self, tag_commits):
+        """ Keep peeled commits of tags for next builds"""
+        index = self.index
+        for name, commit in tag_commits.items():
+            entry = index['loose'].get(name) or index['packed'].get(name)
+            if entry is None:
+                continue
+            commit = _get_hexsha(commit)
+            if entry[-1] != commit:
+                entry[-1] = commit
+                self.changed = True
+
+    def save(self):
+        """ Save index if it was changed"""
+        if self.changed:
+            self.index['ignored'] = sorted(self._ignored)
+            _save_json_file(self.index_file, self.index)
+            self.changed = False
+
+
+def _get_reachable_tag_names_by_walk(repo, tag_commits, metrics=None):
+    """ Fallback: stream history of HEAD from `git rev-list`
+        and collect names of tags which point to its commits.
+        History isn't stored and walk stops when all tag commits are found"""
+    names_by_sha = {}
+    for name, commit in tag_commits.items():
+        names_by_sha.setdefault(
+            _get_hexsha(commit).encode('ascii'), []).append(name)
+    result = set()
+    if not names_by_sha:
+        return result
+    process = repo.git.rev_list('HEAD', as_process=True)
+    commits = 0
+    try:
+        for line in process.stdout:
+            commits += 1
+            result.update(names_by_sha.pop(line.strip(), ()))
+            if not names_by_sha:
+                # rest of history isn't needed
+                process.proc.kill()
+                process.proc.wait()
+                return result
+        process.wait()
+    finally:
+        if metrics:
+            metrics.count('commits_walked', commits)
+    return result
+
+
+def _get_tag_names(repo, *filters):
+    """ Names of tags selected by `git for-each-ref` filters.
+        Its output has fixed format unlike `git tag` which
+        follows user `column.ui` setting"""
+    output = repo.git.for_each_ref('--format=%(refname)', *(
+        filters + ('refs/tags',)))
+    return set(line.strip()[len('refs/tags/'):]
+               for line in output.splitlines() if line.strip())
+
+
+def _get_reachable_tag_names(repo):
+    """ Ask git only about tags reachable from HEAD.
+        Cost depends on number of tags, not on history depth."""
+    return _get_tag_names(repo, '--merged', 'HEAD')
+
+
+def _filter_semver_candidates(names, version_prefix, logger=None):
+    """ Filter tag names by version prefix and SemVer
+        before any commit dereference"""
+    result = set()
+    without_prefix = not_semver = 0
+    for name in names:
+        short = _get_short(name, version_prefix)
+        if not short:
+            without_prefix += 1
+        elif not _get_semver_key(short):
+            not_semver += 1
+        else:
+            result.add(name)
+    if logger:
+        logger.debug("Git tags: %d found, %d skipped without version prefix, "
+                     "%d skipped as not SemVer."
+                     % (len(names), without_prefix, not_semver))
+    return result
+
+
+def _load_reachability_index(index_file):
+    """ Return (indexed HEAD hexsha, sorted binary SHAs) or (None, b'')"""
+    try:
+        with open(index_file, 'rb') as index_content:
+            data = index_content.read()
+    except (IOError, OSError):
+        return None, b''
+    header_size = len(REACHABILITY_INDEX_MAGIC) + SHA_SIZE
+    if (not data.startswith(REACHABILITY_INDEX_MAGIC) or
+            (len(data) - header_size) % SHA_SIZE):
+        return None, b''
+    head = hexlify(data[len(REACHABILITY_INDEX_MAGIC):header_size])
+    return head.decode('ascii'), data[header_size:]
+
+
+def _save_reachability_index(index_file, head_sha, shas):
+    """ Save index file. Index is optional - ignore errors"""
+    tmp_file = index_file + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as index_content:
+            index_content.write(REACHABILITY_INDEX_MAGIC)
+            index_content.write(unhexlify(head_sha))
+            index_content.write(shas)
+        if path.exists(index_file):
+            os.remove(index_file)
+        os.rename(tmp_file, index_file)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def _iter_shas(shas):
+    """ Iterate over binary SHAs from array"""
+    for offset in range(0, len(shas), SHA_SIZE):
+        yield shas[offset:offset + SHA_SIZE]
+
+
+def _contains_sha(shas, sha):
+    """ Binary search of binary SHA into sorted array"""
+    low, high = 0, len(shas) // SHA_SIZE
+    while low < high:
+        middle = (low + high) // 2
+        item = shas[middle * SHA_SIZE:(middle + 1) * SHA_SIZE]
+        if item < sha:
+            low = middle + 1
+        elif item > sha:
+            high = middle
+        else:
+            return True
+    return False
+
+
+def _get_reachability_index(session, logger=None):
+    """
+    Return sorted array of binary SHAs of commits reachable from HEAD.
+    Index is stored into git directory and only commits added
+    since indexed HEAD are listed with `git rev-list`.
+    Index is rebuilt if indexed HEAD isn't ancestor of HEAD anymore.
+    """
+    repo = session.repo
+    head_sha = repo.head.commit.hexsha
+    index_file = path.join(session.git_dir, REACHABILITY_INDEX_FILE)
+    indexed_head, shas = _load_reachability_index(index_file)
+    if indexed_head == head_sha:
+        return shas
+    rev_list_args = [head_sha]
+    if indexed_head:
+        try:
+            if repo.is_ancestor(indexed_head, 'HEAD'):
+                rev_list_args.append('^' + indexed_head)
+            else:
+                shas = b''
+        except _import_git().GitCommandError:
+            # indexed HEAD could be removed by gc
+            shas = b''
+    added = sorted(unhexlify(line.strip())
+                   for line in repo.git.rev_list(*rev_list_args).splitlines()
+                   if line.strip())
+    session.metrics.count('commits_indexed', len(added))
+    if logger:
+        logger.debug("Reachability index: %d commits added to %d."
+                     % (len(added), len(shas) // SHA_SIZE))
+    shas = b''.join(merge(_iter_shas(shas), added))
+    _save_reachability_index(index_file, head_sha, shas)
+    return shas
+
+
+def _has_commit_graph(session):
+    """ Check that git maintains own commit-graph with generation numbers"""
+    info_dir = path.join(_get_common_dir(session.git_dir), 'objects', 'info')
+    return (path.isfile(path.join(info_dir, 'commit-graph')) or
+            path.isdir(path.join(info_dir, 'commit-graphs')))
+
+
+def _get_reachable_tag_commits(session, backend, tag_refs, names,    # pylint: disable=too-many-arguments
+                               reachability, logger=None):
+    """ Return dict tag name -> commit for tags reachable from HEAD"""
+    reachable_names = None
+    if reachability == 'index':
+        if _has_commit_graph(session) or _is_shallow(session):
+            # git answers with generation numbers from commit-graph itself
+            if logger:
+                logger.debug("Reachability index is replaced with "
+                             "`git for-each-ref --merged` for repository with "
+                             "commit-graph or shallow clone.")
+            reachability = 'merged'
+        else:
+            shas = _get_reachability_index(session, logger)
+            tag_commits = _peel_tag_refs(session, backend, tag_refs, names)
+            return dict(
+                (name, commit) for name, commit in tag_commits.items()
+                if _contains_sha(shas, unhexlify(_get_hexsha(commit))))
+    if reachability == 'merged':
+        try:
+            reachable_names = _get_reachable_tag_names(
+                session.repo).intersection(names)
+        except _import_git().GitCommandError:
+            # `--merged` isn't supported by old git versions
+            pass
+    if reachable_names is None:
+        tag_commits = _peel_tag_refs(session, backend, tag_refs, names)
+        reachable_names = _get_reachable_tag_names_by_walk(
+            session.repo, tag_commits, session.metrics)
+        return dict((name, tag_commits[name]) for name in reachable_names)
+    return _peel_tag_refs(session, backend, tag_refs, reachable_names)
+
+
+def _get_reachable_tags_top_down(session, backend, tag_refs, names,    # pylint: disable=too-many-arguments
+                                 version_prefix, limit, is_ordered=False):
+    """ Check tags reachability from the highest SemVer one
+        and stop after `limit` reachable tags were found.
+        Names could be already ordered from the highest SemVer"""
+    ordered_names = names if is_ordered else sorted(
+        names, reverse=True,
+        key=lambda name: _get_semver_key(_get_short(name, version_prefix)))
+    tag_commits = {}
+    for name in ordered_names:
+        commit = _peel_tag_refs(session, backend, tag_refs, [name])[name]
+        if session.repo.is_ancestor(_get_hexsha(commit), 'HEAD'):
+            tag_commits[name] = commit
+            if len(tag_commits) >= limit:
+                break
+    return tag_commits
+
+
+def _is_dirty(repo, mode='index-and-worktree', use_status=False):
+    """
+    Check that repository has uncommitted changes
+
+    :param repo: git.Repo
+    :param mode: `index-and-worktree` - tracked files only,
+                 `index-only` - staged changes only,
+                 `full` - tracked and untracked files,
+                 `off` - don't check
+    :param use_status: use `git status` which reuses fsmonitor
+                       and untracked cache configured for repository
+    """
+    if mode == 'off':
+        return False
+    if use_status and mode != 'index-only':
+        status = repo.git.status(
+            '--porcelain',
+            '--untracked-files=%s' % ('normal' if mode == 'full' else 'no'))
+        return bool(status.strip())
+    return repo.is_dirty(index=True,
+                         working_tree=mode != 'index-only',
+                         untracked_files=mode == 'full')
+
+
+class _RepoInfo(object):    # pylint: disable=too-many-instance-attributes
+    """
+    Information about Git repository collected on demand.
+    Each stage is evaluated on first access only,
+    so resolution does minimal I/O for particular case.
+    Already known values could be passed into constructor.
+    """
+    def __init__(self, session, version_prefix,    # pylint: disable=too-many-arguments
+                 reachability='merged', backend='gitpython', logger=None,
+                 limit=1, dirty_checker=_is_dirty,
+                 tags=None, last_commit=None, is_dirty=None):
+        self.session = session
+        self.version_prefix = version_prefix
+        self.reachability = reachability
+        self.backend = backend
+        self.logger = logger
+        self.limit = limit
+        self.dirty_checker = dirty_checker
+        self._tags = tags
+        self._last_commit = last_commit
+        self._is_dirty = is_dirty
+        self._head_tag_names = None
+
+    @property
+    def last_commit(self):
+        """ Last commit for HEAD"""
+        if self._last_commit is None:
+            repo = self.session.repo
+            with self.session.metrics.timer('head'):
+                self._last_commit = repo.head.commit
+        return self._last_commit
+
+    @property
+    def head_tag_names(self):
+        """ Names of SemVer tags which point to HEAD.
+            None if it couldn't be checked without full resolution"""
+        if self._head_tag_names is None:
+            if self._tags is not None:
+                head_sha = _get_hexsha(self.last_commit)
+                self._head_tag_names = set(
+                    tag.name for tag in self._tags
+                    if _get_hexsha(tag.commit) == head_sha)
+            else:
+                repo = self.session.repo
+                try:
+                    with self.session.metrics.timer('head_tags'):
+                        names = _get_tag_names(repo, '--points-at', 'HEAD')
+                except _import_git().GitCommandError:
+                    # `--points-at` isn't supported by old git
+                    return None
+                self._head_tag_names = _filter_semver_candidates(
+                    names, self.version_prefix)
+        return self._head_tag_names
+
+    @property
+    def tags(self):
+        """ SemVer tags reachable from HEAD - list of _TagInfo"""
+        if self._tags is None:
+            self._tags = self._collect_tags()
+        return self._tags
+
+    @property
+    def is_dirty(self):
+        """ Flag that repository has uncommitted changes"""
+        if self._is_dirty is None:
+            repo = self.session.repo
+            with self.session.metrics.timer('dirty_check'):
+                self._is_dirty = self.dirty_checker(repo)
+        return self._is_dirty
+
+    def _collect_tags(self):
+        metrics = self.session.metrics
+        tag_index = None
+        backend = self.backend
+        if self.session.use_tag_index:
+            with metrics.timer('tag_listing'):
+                tag_index = _TagIndex(self.session, self.version_prefix)
+            # refs of index are read from files
+            backend = 'files'
+            tag_refs = tag_index.tag_refs
+            candidate_names = tag_index.candidates
+            metrics.count('tags_seen', tag_index.tags_count)
+        else:
+            tag_refs = _get_tag_refs(self.session, backend)
+            candidate_names = _filter_semver_candidates(
+                tag_refs, self.version_prefix, self.logger)
+        metrics.count('tags_semver', len(candidate_names))
+        if self.reachability == 'top-down':
+            with metrics.timer('reachability'):
+                tag_commits = _get_reachable_tags_top_down(
+                    self.session, backend, tag_refs, candidate_names,
+                    self.version_prefix, self.limit,
+                    is_ordered=tag_index is not None)
+            if self.logger:
+                self.logger.debug(
+                    "Git tags: %d of %d taken from the highest SemVer."
+                    % (len(tag_commits), len(candidate_names)))
+        else:
+            with metrics.timer('reachability'):
+                tag_commits = _get_reachable_tag_commits(
+                    self.session, backend, tag_refs, candidate_names,
+                    self.reachability, self.logger)
+            if self.logger:
+                self.logger.debug(
+                    "Git tags: %d skipped as not reachable from HEAD."
+                    % (len(candidate_names) - len(tag_commits)))
+        if tag_index is not None:
+            tag_index.set_peeled(tag_commits)
+            tag_index.save()
+        return [_TagInfo(name, tag_commits[name], self.version_prefix)
+                for name in sorted(tag_commits)]
+
+    def __iter__(self):
+        """ Unpack as (list of SemVer TagInfo, last commit for head,
+            is_dirty flag). is_dirty flag is None if HEAD isn't tagged
+            with SemVer tag because version is `.dev` either way"""
+        tags = self.tags
+        return iter((tags,
+                     self.last_commit,
+                     self.is_dirty if self.head_tag_names else None))
+
+
+def _get_repo_info(session, version_prefix, reachability='merged',    # pylint: disable=too-many-arguments
+                   backend='gitpython', logger=None, limit=1,
+                   dirty_checker=_is_dirty):
     """
     Collect information about Git repository
 
     Function include all communication with Git repository.
     That allow to cover basic functionality with tests.
 
-    :param repo_path:
-    :return: (list of TagInfo, last commit for head, is_dirty flag)
+    :param session: _RepoSession for git repository
+    :param version_prefix: prefix into version tag
+    :param reachability: `merged` - ask git for tags merged into HEAD,
+                         `walk` - walk whole history of active branch,
+                         `top-down` - check tags from the highest SemVer
+                         and stop at first `limit` reachable,
+                         `index` - lookup tag commits into persistent
+                         index of commits reachable from HEAD
+    :param backend: `gitpython` - list tags with GitPython,
+                    `files` - read refs files directly
+    :param logger: logger for debug statistics
+    :param limit: number of reachable SemVer tags for `top-down`
+    :param dirty_checker: function which checks that git.Repo is dirty
+    :return: _RepoInfo which evaluates information on demand
     """
-    repo = _get_repo(repo_path)
-    branch_commits_hexsha = []
-    for comm in repo.iter_commits(repo.head):
-        branch_commits_hexsha.append(comm.hexsha)
-    result_tags = []
-    for tag in repo.tags:
-        if tag.commit.hexsha in branch_commits_hexsha:
-            result_tags.append(_TagInfo(tag.name, tag.commit, version_prefix))
-    return (result_tags,
-            repo.head.commit,
-            repo.is_dirty())
-
-
-def _get_repo_name(project, repo_path):
+    return _RepoInfo(session, version_prefix, reachability, backend, logger,
+                     limit, dirty_checker)
+
+
+def _get_tags_by_date(session, version_prefix):
+    """ SemVer tags created not later than HEAD commit.
+        Ancestry isn't checked - history of shallow clone is incomplete"""
+    head_date = session.repo.head.commit.committed_date
+    output = session.repo.git.for_each_ref(
+        '--format=%(refname)\t%(creatordate:unix)\t%(*objectname)\t'
+        '%(objectname)', 'refs/tags')
+    tags = []
+    for line in output.splitlines():
+        ref_name, created, peeled_sha, sha = line.split('\t')
+        tag = _TagInfo(ref_name[len('refs/tags/'):], peeled_sha or sha,
+                       version_prefix)
+        if tag.semver_key and created and int(created) <= head_date:
+            tags.append(tag)
+    return tags
+
+
+def _get_shallow_repo_info(project, session, logger, get_repo_info):
+    """
+    Look for SemVer tags out of history of shallow clone
+
+    :param project: PyBuilder project
+    :param session: _RepoSession for git repository
+    :param logger: PyBuilder logger
+    :param get_repo_info: function without arguments which returns
+                          fresh _RepoInfo
+    :return: _RepoInfo with found tags or None
+    """
+    strategy = _get_choice_property(
+        project, 'semver_git_tag_shallow_strategy', SHALLOW_STRATEGIES)
+    logger.info("Repository is shallow clone, strategy for tags "
+                "out of fetched history: %s" % strategy)
+    if strategy == 'off':
+        logger.warn("Release tag could be out of fetched history. "
+                    "Consider property `semver_git_tag_shallow_strategy`.")
+        return None
+    if strategy == 'date':
+        logger.warn("Tags are selected by date without ancestry check.")
+        return _RepoInfo(
+            session, project.get_property('semver_git_tag_version_prefix'),
+            dirty_checker=_get_dirty_checker(project),
+            tags=_get_tags_by_date(
+                session,
+                project.get_property('semver_git_tag_version_prefix')))
+    depth = SHALLOW_DEEPEN_START
+    shallow = _read_shallow(session.git_dir)
+    for _ in range(SHALLOW_DEEPEN_ATTEMPTS):
+        if not shallow:
+            # history is complete
+            return None
+        logger.info("Deepen shallow clone by %d commits" % depth)
+        try:
+            session.repo.git.fetch('--deepen=%d' % depth)
+        except _import_git().GitCommandError as exc:
+            logger.warn("Couldn't deepen shallow clone: %s" % exc)
+            return None
+        repo_info = get_repo_info()
+        if _seek_last_semver_tag(repo_info.tags):
+            return repo_info
+        fetched_shallow = _read_shallow(session.git_dir)
+        if fetched_shallow == shallow:
+            logger.warn("Shallow clone wasn't deepened by fetch "
+                        "(remote could be shallow itself). "
+                        "No SemVer tag found.")
+            return None
+        shallow = fetched_shallow
+        depth *= 2
+    logger.warn("No SemVer tag found after %d attempts to deepen "
+                "shallow clone." % SHALLOW_DEEPEN_ATTEMPTS)
+    return None
+
+
+# escapes of git config values
+CONFIG_ESCAPES = {'n': '\n', 't': '\t', 'b': '\b', '\\': '\\', '"': '"'}
+# git stops at the same include depth
+CONFIG_INCLUDE_DEPTH = 10
+
+
+def _parse_config_value(raw_value):
+    """ Unquote git config value and strip comment"""
+    value = []
+    quoted = False
+    index = 0
+    while index < len(raw_value):
+        char = raw_value[index]
+        if char == '\\' and index + 1 < len(raw_value):
+            index += 1
+            value.append(CONFIG_ESCAPES.get(raw_value[index], ''))
+        elif char == '"':
+            quoted = not quoted
+        elif char in '#;' and not quoted:
+            break
+        else:
+            value.append(char)
+        index += 1
+    return ''.join(value).strip()
+
+
+def _parse_config_section(header):
+    """ Return (section, subsection) for `[section "subsection"]`
+        and legacy `[section.subsection]` headers"""
+    if '"' in header:
+        section, _, subsection = header.partition('"')
+        return (section.strip().lower(),
+                _parse_config_value('"%s' % subsection.strip()))
+    if '.' in header:
+        section, _, subsection = header.strip().partition('.')
+        return section.lower(), subsection.lower()
+    return header.strip().lower(), None
+
+
+def _read_git_config(config_file, depth=0):
+    """
+    Read git config file without git. `include.path` is followed
+
+    :param config_file: path to config file
+    :param depth: depth of include
+    :return: list of (section, subsection, key, value) in order of file
+             or None if config has conditional includes (`includeIf`)
+    """
+    try:
+        with open(config_file) as config_content:
+            lines = config_content.read().splitlines()
+    except (IOError, OSError):
+        return []
+    entries = []
+    section = subsection = None
+    while lines:
+        line = lines.pop(0)
+        # value continues on the next line after odd number of backslashes
+        while (lines and
+               (len(line) - len(line.rstrip('\\'))) % 2 == 1):
+            line = line[:-1] + lines.pop(0)
+        line = line.strip()
+        if line.startswith('['):
+            header, _, line = line[1:].partition(']')
+            section, subsection = _parse_config_section(header)
+            line = line.strip()
+        if not line or line[0] in '#;':
+            continue
+        key, separator, raw_value = line.partition('=')
+        key = key.strip().lower()
+        # key without value is boolean true
+        value = _parse_config_value(raw_value) if separator else 'true'
+        if section == 'includeif':
+            return None
+        if section == 'include' and key == 'path':
+            if depth >= CONFIG_INCLUDE_DEPTH:
+                continue
+            include_file = path.expanduser(value)
+            if not path.isabs(include_file):
+                include_file = path.join(path.dirname(config_file),
+                                         include_file)
+            included = _read_git_config(include_file, depth + 1)
+            if included is None:
+                return None
+            entries.extend(included)
+        else:
+            entries.append((section, subsection, key, value))
+    return entries
+
+
+def _read_remote_urls(session):
+    """ List of (remote name, url) from repository config in order
+        of config file. None if config can't be read without git"""
+    try:
+        git_dir = session.git_dir
+    except BuildFailedException:
+        # bare repository or GIT_DIR - leave it for GitPython
+        return None
+    entries = _read_git_config(
+        path.join(_get_common_dir(git_dir), 'config'))
+    if entries is None:
+        return None
+    remote_urls = []
+    for section, subsection, key, value in entries:
+        # the first url of remote is used for fetch
+        if (section == 'remote' and key == 'url' and
+                subsection not in [name for name, _ in remote_urls]):
+            remote_urls.append((subsection, value))
+    return remote_urls
+
+
+def _get_repo_name(project, session):
     """ Extract repo name from URL.
         For example `pybuilder_semver_git_tag`
         from `https://github.com/AlexeySanko/pybuilder_semver_git_tag.git`
-        Preferred is `origin` remotes. Otherwise will take first available"""
+        Preferred is `origin` remotes. Otherwise will take first available.
+        Remotes are read from git config file, GitPython is used
+        only for conditional includes"""
     def get_name_from_git_url(url):
         """ Extract penultimate element of GIT url"""
         return path.splitext(path.split(urlparse(url).path)[1])[0]
-    remotes = _get_repo(repo_path).remotes
+    project_name = project.get_property('semver_git_tag_project_name')
+    if project_name:
+        return project_name
+    with session.metrics.timer('name'):
+        remote_urls = _read_remote_urls(session)
+        if remote_urls is None:
+            remote_urls = [(remote.name, remote.url)
+                           for remote in session.repo.remotes]
     # if there are remotes use them, otherwise fall back to parent directory name
-    if remotes is not None and len(remotes) > 0:
-        for remote in remotes:
-            if remote.name == 'origin':
-                return get_name_from_git_url(remote.url)
-        return get_name_from_git_url(remotes[0].url)
+    if remote_urls:
+        for name, url in remote_urls:
+            if name == 'origin':
+                return get_name_from_git_url(url)
+        return get_name_from_git_url(remote_urls[0][1])
     else:
         return os.path.basename(project.basedir)
 
@@ -125,44 +1449,138 @@ def _seek_last_semver_tag(tags, excluded_short=''):
     """
     Seek last SemVer version from tags
     :param tags: list of _TagInfo
-    :param version_prefix: prefix into version tag
     :param excluded_short: short which should be excluded
     :return: _TagInfo with the latest SemVer tag name
     """
-    last_semver_tag = None
-    semver_regex = semver._REGEX  # pylint: disable=protected-access
+    semver_tags = [tag for tag in tags
+                   if tag.semver_key and tag.short != excluded_short]
+    if not semver_tags:
+        return None
+    return max(semver_tags, key=attrgetter('semver_key'))
+
+
+def _seek_last_semver_tags(tags):
+    """
+    Seek last and previous SemVer versions from tags in one pass
+    :param tags: list of _TagInfo
+    :return: (_TagInfo with the latest SemVer tag name,
+              _TagInfo with the previous one)
+    """
+    last_semver_tag = previous_semver_tag = None
     for tag in tags:
-        match = semver_regex.match(tag.short)
-        if match and tag.short != excluded_short:
-            if ((not last_semver_tag) or
-                    (semver.compare(tag.short, last_semver_tag.short) == 1)):
-                last_semver_tag = tag
-    return last_semver_tag
+        if not tag.semver_key:
+            continue
+        if not last_semver_tag or tag.semver_key > last_semver_tag.semver_key:
+            previous_semver_tag = last_semver_tag
+            last_semver_tag = tag
+        elif (tag.short != last_semver_tag.short and
+              (not previous_semver_tag or
+               tag.semver_key > previous_semver_tag.semver_key)):
+            previous_semver_tag = tag
+    return last_semver_tag, previous_semver_tag
+
+
+def _get_changelog_blobs(tree, changelog_files):
+    """ Return {path: blob sha} for changelog paths or glob patterns
+        into git tree"""
+    blobs = {}
+    patterns = []
+    for changelog_file in changelog_files:
+        if any(char in changelog_file for char in '*?['):
+            patterns.append(changelog_file)
+            continue
+        try:
+            blobs[changelog_file] = (tree / changelog_file).hexsha
+        except KeyError:
+            pass
+    if patterns:
+        for item in tree.traverse():
+            if item.type == 'blob' and any(
+                    fnmatchcase(item.path, pattern) for pattern in patterns):
+                blobs[item.path] = item.hexsha
+    return blobs
+
+
+def _get_repo_relative_path(file_path, repo_dir):
+    """ Path relative to repository root with `/` separators"""
+    if not path.isabs(file_path):
+        return file_path.replace(os.sep, '/')
+    relative_dir = path.relpath(path.realpath(path.dirname(file_path)),
+                                path.realpath(repo_dir))
+    return path.normpath(
+        path.join(relative_dir, path.basename(file_path))).replace(os.sep, '/')
 
 
 def check_changelog(changelog_file, repo_path, last_semver_tag, tags, logger):
     """
     Function check fact of changing into changelog file
     since previous release tag
-    :param changelog_file : path to changelog file
+    :param changelog_file : path or list of paths to changelog file.
+                            Glob patterns are supported
     :param repo_path: path to dir with git repo
     :param last_semver_tag: release tag
     :param tags: list of _TagInfo object for git repo
     """
-    logger.debug("Checking changelog changes into file %s" % changelog_file)
-    previous_release_tag = _seek_last_semver_tag(
-        tags, excluded_short=last_semver_tag.short)
-    repo = _get_repo(repo_path)
-    diff = repo.git.diff(
-        previous_release_tag.commit,
-        last_semver_tag.commit,
-        changelog_file)
-    if not diff:
+    session = _RepoSession(repo_path)
+    try:
+        _check_changelog(changelog_file, session, last_semver_tag, tags,
+                         logger)
+    finally:
+        session.close()
+
+
+def _check_changelog(changelog_files, session, last_semver_tag, tags, logger,    # pylint: disable=too-many-arguments
+                     previous_release_tag=None):
+    """
+    Check changelog with build session.
+    Blob SHAs of files are compared into trees of tag commits without diff.
+    :param changelog_files : path or list of paths to changelog file.
+                             Glob patterns are supported. Relative paths
+                             are taken from repository root
+    :param session: _RepoSession for git repo
+    :param last_semver_tag: release tag
+    :param tags: list of _TagInfo object for git repo
+    :param previous_release_tag: previous release tag if already known
+    """
+    if not isinstance(changelog_files, (list, tuple)):
+        changelog_files = [changelog_files]
+    logger.debug("Checking changelog changes into file %s"
+                 % ', '.join(changelog_files))
+    if not previous_release_tag:
+        previous_release_tag = _seek_last_semver_tag(
+            tags, excluded_short=last_semver_tag.short)
+    if not previous_release_tag:
+        # first release - nothing to compare with
+        logger.warn("Previous release tag for %s isn't found. "
+                    "Changelog check is skipped." % last_semver_tag.name)
+        return
+    repo = session.repo
+    relative_files = [_get_repo_relative_path(changelog_file,
+                                              repo.working_tree_dir)
+                      for changelog_file in changelog_files]
+    with session.metrics.timer('changelog'):
+        previous_blobs = _get_changelog_blobs(
+            repo.commit(_get_hexsha(previous_release_tag.commit)).tree,
+            relative_files)
+        current_blobs = _get_changelog_blobs(
+            repo.commit(_get_hexsha(last_semver_tag.commit)).tree,
+            relative_files)
+    if previous_blobs == current_blobs:
         raise BuildFailedException(
             "Not found changes between previous tag %s and current tag %s"
             " into configured changelog file %s"
             % (previous_release_tag.name, last_semver_tag.name,
-               changelog_file))
+               ', '.join(changelog_files)))
+
+
+def _get_changelog_files(project):
+    """ Return list of absolute paths or glob patterns
+        from `semver_git_tag_changelog` property"""
+    changelog = project.get_property('semver_git_tag_changelog')
+    if not isinstance(changelog, (list, tuple)):
+        changelog = changelog.split(',')
+    return [project.expand_path(changelog_file.strip())
+            for changelog_file in changelog if changelog_file.strip()]
 
 
 def _get_repo_path(project):
@@ -174,61 +1592,318 @@ def _get_repo_path(project):
         else project.basedir)
 
 
-def set_version_from_git_tag(project, logger):
-    """ Set project version according git tags"""
+def _get_choice_property(project, key, choices):
+    """ Return validated property value. First choice is default"""
+    value = project.get_property(key)
+    if not value:
+        return choices[0]
+    if value not in choices:
+        raise BuildFailedException(
+            "Incorrect value for `%s` property. "
+            "Has to be in (%s), but `%s` passed."
+            % (key, ', '.join('`%s`' % choice for choice in choices), value))
+    return value
+
+
+def _get_reachability(project):
+    """ Return validated `semver_git_tag_reachability` property value"""
+    return _get_choice_property(
+        project, 'semver_git_tag_reachability', REACHABILITY_MODES)
+
+
+def _get_dirty_checker(project):
+    """ Return function which checks dirty flag according properties"""
+    mode = _get_choice_property(
+        project, 'semver_git_tag_dirty_check', DIRTY_CHECK_MODES)
+    use_status = _get_bool_property(
+        project, 'semver_git_tag_dirty_check_status')
+    return lambda repo: _is_dirty(repo, mode, use_status)
+
+
+def _get_peel_batch_size(project):
+    """ Return validated `semver_git_tag_peel_batch_size` property value"""
+    batch_size = project.get_property('semver_git_tag_peel_batch_size')
+    try:
+        batch_size = int(batch_size or 0)
+    except ValueError:
+        batch_size = -1
+    if batch_size < 0:
+        raise BuildFailedException(
+            "Incorrect value for `semver_git_tag_peel_batch_size` property. "
+            "Has to be not negative number, but `%s` passed."
+            % project.get_property('semver_git_tag_peel_batch_size'))
+    return batch_size
+
+
+def _get_refs_backend(project):
+    """ Return validated `semver_git_tag_refs_backend` property value"""
+    return _get_choice_property(
+        project, 'semver_git_tag_refs_backend', REFS_BACKENDS)
+
+
+def _get_bool_property(project, key):
+    """ Return boolean value of property.
+        Properties from command line are passed as strings"""
+    value = project.get_property(key)
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', 'on', '1')
+    return bool(value)
+
+
+def _get_dev_version(last_semver_tag, increase_part):
+    """ Increase version of tag with particular part and add .dev"""
+    major, minor, patch = last_semver_tag.semver_key[:3]
+    if increase_part == 'major':
+        return _add_dev('%d.0.0' % (major + 1))
+    elif increase_part == 'minor':
+        return _add_dev('%d.%d.0' % (major, minor + 1))
+    elif increase_part == 'patch':
+        return _add_dev('%d.%d.%d' % (major, minor, patch + 1))
+    raise BuildFailedException(
+        "Incorrect value for `semver_git_tag_increment_part` property. "
+        "Has to be in (`major`, `minor`, `patch`), but `%s` passed."
+        % increase_part)
+
+
+def _bump_version(project, last_semver_tag):
+    """ Increase version with configured part and add .dev"""
+    return _get_dev_version(
+        last_semver_tag, project.get_property('semver_git_tag_increment_part'))
+
+
+def _resolve_version_from_override(project, logger, session):  # pylint: disable=unused-argument
+    """ Set project version from `semver_git_tag_version` property
+        or SEMVER_GIT_TAG_VERSION environment variable"""
+    version = project.get_property('semver_git_tag_version')
+    if version:
+        project.version = version
+        return 'property'
+    version = os.environ.get(VERSION_ENV_VARIABLE)
+    if version:
+        project.version = version
+        return 'environment'
+    return None
+
+
+def _resolve_version_from_ci(project, logger, session):  # pylint: disable=unused-argument
+    """ Set release version from tag which is built by CI server"""
+    if not _get_bool_property(project, 'semver_git_tag_ci_metadata'):
+        return None
+    if os.environ.get('GITHUB_REF', '').startswith('refs/tags/'):
+        ci_tags = [os.environ['GITHUB_REF'][len('refs/tags/'):]]
+    else:
+        ci_tags = [os.environ[key] for key in CI_TAG_VARIABLES
+                   if os.environ.get(key)]
+    if not ci_tags:
+        return None
+    version_prefix = project.get_property('semver_git_tag_version_prefix')
+    tag = _TagInfo(ci_tags[0], None, version_prefix)
+    if not tag.semver_key:
+        logger.debug("CI tag %s isn't SemVer tag - skip CI metadata."
+                     % tag.name)
+        return None
+    if project.get_property('semver_git_tag_changelog'):
+        logger.debug("Changelog check needs git - skip CI metadata.")
+        return None
+    logger.info("Found SemVer tag: %s" % tag.name)
+    project.version = tag.name
+    session.resolution['tag'] = tag.name
+    return 'CI metadata'
+
+
+def _resolve_version_from_resident(project, logger, session):
+    """ Set project version from previous resolution in this process
+        if HEAD and tag refs weren't changed since it.
+        Return name of source or None"""
+    if not _get_bool_property(project, 'semver_git_tag_resident'):
+        return None
+    resident = _RESIDENT.get(path.realpath(session.repo_path))
+    if (resident is None or
+            resident['key'] != _get_resident_key(project) or
+            resident['stamp'] != _get_refs_stamp(session.git_dir)):
+        return None
+    last_semver_tag = _TagInfo(
+        resident['tag'], None,
+        project.get_property('semver_git_tag_version_prefix'))
+    repo_is_dirty = None
+    if resident['release']:
+        # worktree changes don't touch refs - check dirty flag again
+        with session.metrics.timer('dirty_check'):
+            repo_is_dirty = _get_dirty_checker(project)(session.repo)
+        project.version = (_bump_version(project, last_semver_tag)
+                           if repo_is_dirty else last_semver_tag.name)
+    else:
+        project.version = resident['version']
+    session.resolution.update({'tag': resident['tag'],
+                               'sha': resident['head'],
+                               'dirty': repo_is_dirty})
+    logger.debug("Version resolution is taken from previous build: "
+                 "refs weren't changed.")
+    return 'resident'
+
+
+def _resolve_version_from_git(project, logger, session):
+    """ Set project version according git tags or version cache.
+        Return name of source or None if SemVer tag wasn't found"""
+    # stamp is taken before resolution: refs changed during it
+    # make resident resolution stale
+    resident_stamp = (_get_refs_stamp(session.git_dir)
+                      if _get_bool_property(project, 'semver_git_tag_resident')
+                      else None)
     # get git info
     version_prefix = project.get_property('semver_git_tag_version_prefix')
-    repo_path = _get_repo_path(project)
-    tags, last_commit, repo_is_dirty = _get_repo_info(repo_path, version_prefix)
+    reachability = _get_reachability(project)
+    dirty_checker = _get_dirty_checker(project)
+    session.peel_batch_size = _get_peel_batch_size(project)
+    session.peel_fallback = _get_choice_property(
+        project, 'semver_git_tag_peel_fallback', PEEL_FALLBACKS)
+    session.use_tag_index = _get_bool_property(
+        project, 'semver_git_tag_tag_index')
+    cache_file = cache_key = cache = None
+    cache_hit = False
+    if _get_bool_property(project, 'semver_git_tag_cache'):
+        git_dir = session.git_dir
+        head_sha = _read_head_sha(git_dir)
+        if head_sha:
+            cache_file = path.join(git_dir, CACHE_FILE_NAME)
+            with session.metrics.timer('cache'):
+                cache_key = _get_cache_key(git_dir, head_sha, project)
+                cache = _load_version_cache(cache_file, cache_key)
+            cache_hit = cache is not None
+    if cache_hit:
+        logger.debug("Version resolution is taken from cache %s" % cache_file)
+        # dirty flag isn't covered with cache key
+        repo_info = _RepoInfo(
+            session, version_prefix, dirty_checker=dirty_checker,
+            tags=[_TagInfo(name, commit, version_prefix)
+                  for name, commit in cache['tags']],
+            last_commit=cache['head'])
+    else:
+        def get_repo_info():
+            """ Collect repository information on demand"""
+            repo_info = _get_repo_info(
+                session, version_prefix, reachability,
+                _get_refs_backend(project), logger, 1, dirty_checker)
+            # previous release tag is needed for changelog check
+            # only if HEAD is tagged
+            if (project.get_property('semver_git_tag_changelog') and
+                    repo_info.head_tag_names != set()):
+                repo_info.limit = 2
+            return repo_info
+        repo_info = get_repo_info()
+        if (not _seek_last_semver_tag(repo_info.tags) and
+                _is_shallow(session)):
+            repo_info = (_get_shallow_repo_info(
+                project, session, logger, get_repo_info) or repo_info)
+    tags = repo_info.tags
+    last_commit = repo_info.last_commit
     tag_list = []
     for tag in tags:
         tag_list.append(tag.name)
-    logger.debug("All git tags: %s." % ','.join(tag_list))
-    # get last tag which satisfies SemVer
-    last_semver_tag = _seek_last_semver_tag(tags)
+    logger.debug("SemVer git tags reachable from HEAD: %s."
+                 % ','.join(tag_list))
+    # get last tag which satisfies SemVer and previous one
+    last_semver_tag, previous_semver_tag = _seek_last_semver_tags(tags)
+    save_cache = cache_file is not None and not cache_hit
+    if save_cache:
+        cache = {'key': cache_key,
+                 'head': _get_hexsha(last_commit),
+                 'tags': [[tag.name, _get_hexsha(tag.commit)]
+                          for tag in tags],
+                 'last_semver_tag': (last_semver_tag.name
+                                     if last_semver_tag else None),
+                 'version': None}
     if not last_semver_tag:
+        if save_cache:
+            _save_json_file(cache_file, cache)
         logger.warn(
             "No SemVer git tag found. "
             "Consider removing plugin pybuilder_semver_git_tag.")
-        return
+        return None
     else:
         logger.info("Found SemVer tag: %s" % last_semver_tag.name)
     # get last commit for HEAD
     # if dirty or last commit isn't equal last tag commit
     # - increase version and add .dev
-    if last_commit != last_semver_tag.commit or repo_is_dirty:
+    # dirty flag is evaluated only if it could change version
+    is_tag_commit = (_get_hexsha(last_commit) ==
+                     _get_hexsha(last_semver_tag.commit))
+    repo_is_dirty = is_tag_commit and repo_info.is_dirty
+    session.resolution.update({
+        'tag': last_semver_tag.name, 'sha': _get_hexsha(last_commit),
+        'dirty': repo_is_dirty if is_tag_commit else None})
+    if not is_tag_commit or repo_is_dirty:
         if repo_is_dirty:
             logger.debug("Repo is marked as dirty - use dev version.")
         else:
             logger.debug("Last tag %s has commit %s, "
                          "but last commit is %s - use dev version."
                          % (last_semver_tag.name,
-                            str(last_semver_tag.commit),
-                            str(last_commit)))
-        increase_part = project.get_property('semver_git_tag_increment_part')
-        if increase_part == 'major':
-            project.version = _add_dev(semver.bump_major(last_semver_tag.name))
-        elif increase_part == 'minor':
-            project.version = _add_dev(semver.bump_minor(last_semver_tag.name))
-        elif increase_part == 'patch':
-            project.version = _add_dev(semver.bump_patch(last_semver_tag.name))
+                            _get_hexsha(last_semver_tag.commit),
+                            _get_hexsha(last_commit)))
+        if cache_hit and cache['version']:
+            project.version = cache['version']
         else:
-            raise BuildFailedException(
-                "Incorrect value for `semver_git_tag_increment_part` property. "
-                "Has to be in (`major`, `minor`, `patch`), but `%s` passed."
-                % project.get_property('semver_git_tag_increment_part'))
+            project.version = _bump_version(project, last_semver_tag)
+            if cache:
+                cache['version'] = project.version
+                save_cache = True
     # if not dirty and last commit is equal last tag commit
     # - it's release tag
     else:
         project.version = last_semver_tag.name
         if project.get_property('semver_git_tag_changelog'):
-            check_changelog(project.expand_path('$semver_git_tag_changelog'),
-                            repo_path, last_semver_tag, tags, logger)
-    logger.info("Project version was set to: %s, dist_version: %s"
-                % (project.version, project.dist_version))
+            _check_changelog(_get_changelog_files(project),
+                             session, last_semver_tag, tags, logger,
+                             previous_semver_tag)
+    if save_cache:
+        _save_json_file(cache_file, cache)
+    if resident_stamp is not None:
+        _RESIDENT[path.realpath(session.repo_path)] = {
+            'stamp': resident_stamp, 'key': _get_resident_key(project),
+            'tag': last_semver_tag.name, 'head': _get_hexsha(last_commit),
+            'release': is_tag_commit, 'version': project.version}
+    return 'cache' if cache_hit else 'git'
 
 
-def force_semver_git_tag_plugin(project, logger):
+def set_version_from_git_tag(project, logger, session=None):
+    """ Set project version according git tags.
+        Sources are checked in order: explicit version, CI metadata,
+        resident resolution, version cache and git repository"""
+    if session is None:
+        session = _RepoSession(_get_repo_path(project))
+        try:
+            return set_version_from_git_tag(project, logger, session)
+        finally:
+            session.close()
+    session.resolution = {'source': None, 'tag': None, 'sha': None,
+                          'dirty': None}
+    for resolve_version in (_resolve_version_from_override,
+                            _resolve_version_from_ci,
+                            _resolve_version_from_resident,
+                            _resolve_version_from_git):
+        with session.metrics.timer('version'):
+            source = resolve_version(project, logger, session)
+        if source:
+            session.resolution['source'] = source
+            logger.info("Project version was set to: %s, dist_version: %s "
+                        "(source: %s)"
+                        % (project.version, project.dist_version, source))
+            return
+
+
+@contextmanager
+def _closing_sessions_on_error(project, logger):
+    """ Report metrics and close build sessions if resolution fails:
+        PyBuilder runs finalizers only for successful build"""
+    try:
+        yield
+    except Exception:
+        close_semver_git_tag_sessions(project, logger)
+        raise
+
+
+def force_semver_git_tag_plugin(project, logger, session=None):
     """ Force call SemVer git tag plugin on import stage"""
     # workaround for command line properties
     # until https://github.com/pybuilder/pybuilder/pull/515
@@ -238,10 +1913,18 @@ def force_semver_git_tag_plugin(project, logger):
         for arg in sys.argv:
             if str(arg).startswith(key + '='):
                 project.set_property(key, str(arg).replace(key + '=', ''))
-    # set project.name
-    project.name = _get_repo_name(project, _get_repo_path(project))
-    # set project.version
-    set_version_from_git_tag(project, logger)
+    if _get_bool_property(project, 'semver_git_tag_lazy'):
+        # name and version will be resolved before `prepare` task
+        logger.debug("Project name and version resolution according git tag "
+                     "is deferred.")
+    else:
+        with _closing_sessions_on_error(project, logger):
+            if session is None:
+                session = _get_session(_get_repo_path(project))
+            # set project.name
+            project.name = _get_repo_name(project, session)
+            # set project.version
+            set_version_from_git_tag(project, logger, session)
     # save current properties
     for key in DEFAULT_PROPERTIES:
         project.set_property_if_unset(key + SAVED_PROP_SUFFIX,
@@ -270,14 +1953,101 @@ def initialize_semver_git_tag(project):
     project.set_property_if_unset('semver_git_tag_changelog', None)
     # Specific prefix of release tags. For example, 'v' for 'v1.2.3' tag
     project.set_property_if_unset('semver_git_tag_version_prefix', '')
+    # How to find tags reachable from HEAD:
+    # 'merged' - ask git for tags merged into HEAD (fast),
+    # 'walk' - walk whole history of active branch (fallback),
+    # 'top-down' - check tags from the highest SemVer
+    # and stop at the first reachable,
+    # 'index' - incremental index of reachable commits into git directory
+    project.set_property_if_unset('semver_git_tag_reachability', 'merged')
+    # Cache version resolution into git directory.
+    # Cache is keyed with HEAD, tag refs and version-related properties
+    project.set_property_if_unset('semver_git_tag_cache', False)
+    # How to read tags: 'gitpython' - with GitPython,
+    # 'files' - read packed-refs and loose refs directly
+    project.set_property_if_unset('semver_git_tag_refs_backend', 'gitpython')
+    # How to check uncommitted changes: 'index-and-worktree' - tracked files,
+    # 'index-only' - staged changes, 'full' - with untracked files, 'off'
+    project.set_property_if_unset('semver_git_tag_dirty_check',
+                                  'index-and-worktree')
+    # Use `git status` which reuses fsmonitor and untracked cache
+    project.set_property_if_unset('semver_git_tag_dirty_check_status', False)
+    # Resolve name and version before `prepare` task instead of import stage.
+    # Works only from command line `pyb ... -P semver_git_tag_lazy=True`
+    project.set_property_if_unset('semver_git_tag_lazy', False)
+    # Explicit project version. Git isn't used if it's set
+    project.set_property_if_unset('semver_git_tag_version', None)
+    # Take release version from tag which is built by CI server
+    project.set_property_if_unset('semver_git_tag_ci_metadata', False)
+    # Strategy for shallow clone if no SemVer tag found into fetched history:
+    # `off` - only warning, `deepen` - fetch history until SemVer tag,
+    # `date` - take tags created before HEAD commit without ancestry check
+    project.set_property_if_unset('semver_git_tag_shallow_strategy', 'off')
+    # Keep resolution in process for watch mode and IDE builds.
+    # It's reused while HEAD, branch ref and tag refs files aren't changed
+    project.set_property_if_unset('semver_git_tag_resident', False)
+    # Explicit project name. Remotes aren't read if it's set
+    project.set_property_if_unset('semver_git_tag_project_name', None)
+    # Tags which `files` refs backend can't peel from files are peeled
+    # with `git cat-file --batch-check`: number of tags per process (0 - all)
+    project.set_property_if_unset('semver_git_tag_peel_batch_size', 0)
+    # If batch peeling fails: 'per-tag' - peel tags one by one with GitPython,
+    # 'fail' - fail build
+    project.set_property_if_unset('semver_git_tag_peel_fallback', 'per-tag')
+    # Keep persistent index of tag refs into git directory:
+    # only changed refs are read, SemVer tags are kept sorted
+    project.set_property_if_unset('semver_git_tag_tag_index', False)
+    # Write timings and counters of resolution into
+    # $dir_reports/semver_git_tag_metrics.json
+    project.set_property_if_unset('semver_git_tag_metrics_report', False)
+    # Fail build if name and version resolution takes more seconds
+    project.set_property_if_unset('semver_git_tag_time_budget', None)
+
+
+def _write_metrics_report(project, logger, report):
+    """ Write metrics of resolution as JSON into reports directory"""
+    report_file = project.expand_path('$dir_reports',
+                                      METRICS_REPORT_FILE_NAME)
+    if not path.isdir(path.dirname(report_file)):
+        os.makedirs(path.dirname(report_file))
+    with open(report_file, 'w') as report_content:
+        json.dump(report, report_content, indent=2, sort_keys=True)
+    logger.debug("SemVer git tag metrics were written to %s" % report_file)
+
+
+def _check_time_budget(project, session):
+    """ Fail build if resolution exceeded `semver_git_tag_time_budget`"""
+    budget = project.get_property('semver_git_tag_time_budget')
+    if budget in (None, ''):
+        return
+    try:
+        budget = float(budget)
+    except ValueError:
+        raise BuildFailedException(
+            "Incorrect value for `semver_git_tag_time_budget` property. "
+            "Has to be number of seconds, but `%s` passed." % budget)
+    if session.metrics.total > budget:
+        raise BuildFailedException(
+            "SemVer git tag resolution took %.3f s which exceeds "
+            "time budget %s s. Details: %s"
+            % (session.metrics.total, budget, session.metrics))
 
 
 @before("prepare", only_once=True)
 def update_version_from_git_tag(project, logger):
-    """ Update project version according git tags if any property was changed"""
+    """ Update project version according git tags if any property was changed
+        or resolution was deferred on import stage"""
+    # plugin module is imported once per process: next builds
+    # of long-lived process (daemon, IDE) don't pass import stage
+    is_import_skipped = not project.has_property(
+        'semver_git_tag_lazy' + SAVED_PROP_SUFFIX)
+    is_deferred = is_import_skipped or _get_bool_property(
+        project, 'semver_git_tag_lazy' + SAVED_PROP_SUFFIX)
     # Compare properties saved on import stage with actual
     are_properties_changed = False
     for key in DEFAULT_PROPERTIES:
+        if key == 'semver_git_tag_lazy' or is_import_skipped:
+            continue
         if (project.get_property(key + SAVED_PROP_SUFFIX) !=
                 project.get_property(key)):
             logger.warn("Property `{prop}` was changed. "
@@ -286,13 +2056,34 @@ def update_version_from_git_tag(project, logger):
                         "otherwise some version-related properties could "
                         "be spoiled.".format(prop=key))
             are_properties_changed = True
-    if are_properties_changed:
-        logger.info("Updating project version according git tag...")
-        set_version_from_git_tag(project, logger)
-        # DISTRIBUTION_PROPERTY is also be affected
-        project.set_property(DISTRIBUTION_PROPERTY,
-                             "$dir_target/dist/{0}-{1}".format(
-                                 project.name, project.version))
-        logger.info("Additional affected properties: %s: %s"
-                    % (DISTRIBUTION_PROPERTY,
-                       project.get_property(DISTRIBUTION_PROPERTY)))
+    with _closing_sessions_on_error(project, logger):
+        if is_deferred or are_properties_changed:
+            logger.info("Updating project version according git tag...")
+            session = _get_session(_get_repo_path(project))
+            # name from build.py has priority
+            if is_deferred and project.name == path.basename(project.basedir):
+                project.name = _get_repo_name(project, session)
+            set_version_from_git_tag(project, logger, session)
+            # DISTRIBUTION_PROPERTY is also be affected
+            project.set_property(DISTRIBUTION_PROPERTY,
+                                 "$dir_target/dist/{0}-{1}".format(
+                                     project.name, project.version))
+            logger.info("Additional affected properties: %s: %s"
+                        % (DISTRIBUTION_PROPERTY,
+                           project.get_property(DISTRIBUTION_PROPERTY)))
+        _check_time_budget(project, _get_session(_get_repo_path(project)))
+
+
+@finalize
+def close_semver_git_tag_sessions(project, logger):
+    """ Report metrics and close repositories opened during build"""
+    report = {}
+    for repo_path, session in _SESSIONS.items():
+        logger.debug("SemVer git tag resolution for %s took %s"
+                     % (repo_path, session.metrics))
+        report[repo_path] = session.metrics.as_dict()
+    if report and _get_bool_property(project,
+                                     'semver_git_tag_metrics_report'):
+        _write_metrics_report(project, logger, report)
+    logger.debug("Closing git repositories opened by SemVer git tag plugin")
+    _close_sessions()
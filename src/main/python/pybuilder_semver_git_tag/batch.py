@@ -0,0 +1,155 @@
+#   -*- coding: utf-8 -*-
+#
+#   Copyright 2017 Alexey Sanko
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+    Resolve names and versions of many git repositories without PyBuilder
+    build. Repositories are resolved concurrently with bounded thread pool,
+    work is done by git processes, so threads are enough.
+"""
+import argparse
+import json
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+import sys
+import time
+
+from pybuilder.core import Project
+
+from pybuilder_semver_git_tag import (
+    _get_repo_name,
+    _RepoSession,
+    initialize_semver_git_tag,
+    set_version_from_git_tag
+)
+
+
+class _BatchLogger(object):
+    """ Logger for resolution without PyBuilder: keeps warnings only"""
+    def __init__(self):
+        self.warnings = []
+
+    def debug(self, message):
+        """ Debug messages are skipped"""
+        pass
+
+    def info(self, message):
+        """ Info messages are skipped"""
+        pass
+
+    def warn(self, message):
+        """ Keep warning for result"""
+        self.warnings.append(message)
+
+    warning = warn
+
+
+def resolve_repository(repo_dir, properties=None):
+    """
+    Resolve name and version of one repository like plugin does for build
+
+    :param repo_dir: root of git repository (project base directory)
+    :param properties: dict of plugin properties
+    :return: dict with keys `repo`, `name`, `version`, `tag`, `sha`,
+             `dirty`, `source`, `seconds`, `warnings` and `error`
+    """
+    started = time.time()
+    result = {'repo': repo_dir, 'name': None, 'version': None, 'tag': None,
+              'sha': None, 'dirty': None, 'source': None, 'error': None}
+    project = Project(repo_dir)
+    initialize_semver_git_tag(project)
+    for key, value in (properties or {}).items():
+        project.set_property(key, value)
+    logger = _BatchLogger()
+    session = _RepoSession(project.get_property('semver_git_tag_repo_dir')
+                           or repo_dir)
+    try:
+        result['name'] = _get_repo_name(project, session)
+        set_version_from_git_tag(project, logger, session)
+        result.update(session.resolution)
+        if result['source']:
+            result['version'] = project.version
+    except Exception as exc:    # pylint: disable=broad-except
+        # one broken repository shouldn't stop whole batch
+        result['error'] = str(exc)
+    finally:
+        session.close()
+    result['warnings'] = logger.warnings
+    result['seconds'] = round(time.time() - started, 3)
+    return result
+
+
+def resolve_repositories(repo_dirs, properties=None, jobs=None):
+    """
+    Resolve repositories concurrently
+
+    :param repo_dirs: list of repository roots
+    :param properties: dict of plugin properties for all repositories
+    :param jobs: number of threads, CPU count by default
+    :return: iterator over results of `resolve_repository`
+             in order of completion
+    """
+    pool = ThreadPool(jobs or cpu_count())
+    try:
+        for result in pool.imap_unordered(
+                lambda repo_dir: resolve_repository(repo_dir, properties),
+                repo_dirs):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _parse_property(value):
+    key, separator, property_value = value.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(
+            "Property has to be `key=value`, but `%s` passed." % value)
+    return key, property_value
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Resolve names and versions of git repositories "
+                    "from SemVer tags and print JSON line per repository.")
+    parser.add_argument('repo_dirs', nargs='*', metavar='REPO_DIR',
+                        help="repository roots. Read from stdin "
+                             "(line per repository) if not passed")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of concurrent resolutions "
+                             "(default: CPU count)")
+    parser.add_argument('-P', dest='properties', action='append',
+                        type=_parse_property, default=[],
+                        metavar='KEY=VALUE',
+                        help="plugin property like `pyb -P`")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """ Command line entry point. Exit code is 1 if any repository failed"""
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    repo_dirs = args.repo_dirs or [line.strip() for line in sys.stdin
+                                   if line.strip()]
+    failed = False
+    for result in resolve_repositories(repo_dirs, dict(args.properties),
+                                       args.jobs):
+        failed = failed or bool(result['error'])
+        sys.stdout.write(json.dumps(result, sort_keys=True) + '\n')
+        sys.stdout.flush()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#   -*- coding: utf-8 -*-
+#
+#   Copyright 2017 Alexey Sanko
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""
+    Versions of several sub-projects of one git repository.
+    Each sub-project has own version prefix of tags (`svc-a/v1.2.3`).
+    Tags and their reachability from HEAD are collected once
+    for all sub-projects.
+"""
+import argparse
+import json
+import os
+from os import path
+import sys
+
+from pybuilder.errors import BuildFailedException
+
+from pybuilder_semver_git_tag import (
+    REFS_BACKENDS,
+    _filter_semver_candidates,
+    _get_dev_version,
+    _get_hexsha,
+    _get_reachable_tag_commits,
+    _get_tag_refs,
+    _RepoSession,
+    _seek_last_semver_tag,
+    _TagInfo
+)
+
+# `top-down` is selected per version prefix and doesn't fit one pass
+MONOREPO_REACHABILITY_MODES = ('merged', 'walk', 'index')
+
+
+def _get_relative_dir(project_dir, repo_dir):
+    """ Directory relative to repository root with `/` separators.
+        `.` for repository root"""
+    if path.isabs(project_dir):
+        project_dir = path.relpath(path.realpath(project_dir),
+                                   path.realpath(repo_dir))
+    return path.normpath(project_dir).replace(os.sep, '/')
+
+
+def _get_tree_sha(commit, relative_dir):
+    """ SHA of tree for directory into commit or None if it's absent"""
+    if relative_dir == '.':
+        return commit.tree.hexsha
+    try:
+        return (commit.tree / relative_dir).hexsha
+    except KeyError:
+        return None
+
+
+def _get_subproject_version(session, head, subproject, last_semver_tag,    # pylint: disable=too-many-arguments
+                            changed_only):
+    """ Return dict with version of sub-project"""
+    project_dir, _, increment_part = subproject
+    result = {'dir': project_dir, 'version': None, 'tag': None,
+              'changed': None}
+    if not last_semver_tag:
+        return result
+    result['tag'] = last_semver_tag.name
+    repo = session.repo
+    relative_dir = _get_relative_dir(project_dir, repo.working_tree_dir)
+    if _get_hexsha(last_semver_tag.commit) == head.hexsha:
+        changed = False
+    elif changed_only:
+        changed = (_get_tree_sha(head, relative_dir) !=
+                   _get_tree_sha(repo.commit(_get_hexsha(
+                       last_semver_tag.commit)), relative_dir))
+    else:
+        changed = True
+    if not changed:
+        changed = repo.is_dirty(
+            path=None if relative_dir == '.' else relative_dir)
+    result['changed'] = changed
+    result['version'] = (_get_dev_version(last_semver_tag, increment_part)
+                         if changed else last_semver_tag.short)
+    return result
+
+
+def resolve_versions(repo_dir, subprojects, changed_only=False,    # pylint: disable=too-many-arguments, too-many-locals
+                     reachability='merged', backend='gitpython',
+                     logger=None):
+    """
+    Resolve versions of several sub-projects with one pass over git tags
+
+    :param repo_dir: root of git repository
+    :param subprojects: list of (project dir, version prefix,
+                        increment part) tuples. Project dir is relative
+                        to repository root or absolute
+    :param changed_only: if True sub-project without changes
+                         since its last tag keeps release version
+    :param reachability: `merged`, `walk` or `index`
+    :param backend: `gitpython` or `files`
+    :param logger: logger for debug statistics
+    :return: list of dicts with keys `dir`, `version`, `tag`
+             and `changed` in order of sub-projects.
+             `version` is None if sub-project hasn't SemVer tag
+    """
+    if reachability not in MONOREPO_REACHABILITY_MODES:
+        raise BuildFailedException(
+            "Incorrect reachability `%s` for monorepo. Has to be in (%s)."
+            % (reachability, ', '.join(
+                '`%s`' % mode for mode in MONOREPO_REACHABILITY_MODES)))
+    if backend not in REFS_BACKENDS:
+        raise BuildFailedException(
+            "Incorrect refs backend `%s`. Has to be in (%s)."
+            % (backend, ', '.join('`%s`' % mode for mode in REFS_BACKENDS)))
+    session = _RepoSession(repo_dir)
+    try:
+        tag_refs = _get_tag_refs(session, backend)
+        candidates = {}
+        for _, version_prefix, _ in subprojects:
+            if version_prefix not in candidates:
+                candidates[version_prefix] = _filter_semver_candidates(
+                    tag_refs, version_prefix, logger)
+        tag_commits = _get_reachable_tag_commits(
+            session, backend, tag_refs, set().union(*candidates.values()),
+            reachability, logger)
+        head = session.repo.head.commit
+        results = []
+        for subproject in subprojects:
+            version_prefix = subproject[1]
+            tags = [_TagInfo(name, tag_commits[name], version_prefix)
+                    for name in candidates[version_prefix]
+                    if name in tag_commits]
+            results.append(_get_subproject_version(
+                session, head, subproject, _seek_last_semver_tag(tags),
+                changed_only))
+        return results
+    finally:
+        session.close()
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Resolve versions of sub-projects of git repository "
+                    "from SemVer tags with own version prefixes.")
+    parser.add_argument(
+        '-p', '--project', nargs=3, action='append', required=True,
+        metavar=('DIR', 'PREFIX', 'INCREMENT'),
+        help="sub-project directory relative to repository root, "
+             "version prefix of its tags and increment part "
+             "(major, minor or patch)")
+    parser.add_argument('-r', '--repo-dir', default='.',
+                        help="root of git repository (default: current)")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="keep release version for sub-projects "
+                             "without changes since last tag")
+    parser.add_argument('--reachability', default='merged',
+                        choices=MONOREPO_REACHABILITY_MODES)
+    parser.add_argument('--refs-backend', default='gitpython',
+                        choices=REFS_BACKENDS)
+    parser.add_argument('--json', action='store_true',
+                        help="print JSON object per sub-project")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """ Command line entry point"""
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        results = resolve_versions(
+            args.repo_dir, [tuple(project) for project in args.project],
+            args.changed_only, args.reachability, args.refs_backend)
+    except BuildFailedException as exc:
+        sys.stderr.write("%s\n" % exc)
+        return 1
+    for result in results:
+        if args.json:
+            sys.stdout.write(json.dumps(result, sort_keys=True) + '\n')
+        else:
+            sys.stdout.write("%s\t%s\n" % (result['dir'], result['version']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -17,23 +17,68 @@
 Tests for pybuilder_semver_git_tag module
 
 """
+from binascii import unhexlify
+import json
+import os
+from os import makedirs, path
 from random import shuffle
-from unittest import TestCase
+from shutil import rmtree
+from subprocess import PIPE, Popen
+import sys
+from tempfile import mkdtemp
+import time
+from unittest import TestCase, skipIf
+import zlib
 
+from git import GitCommandError
 from mock import Mock, patch
 from pybuilder.core import Project
 from pybuilder.errors import BuildFailedException
+import semver
 
 from pybuilder_semver_git_tag import (
     _add_dev,
     _TagInfo,
     initialize_semver_git_tag,
     _seek_last_semver_tag,
+    _seek_last_semver_tags,
     set_version_from_git_tag,
     force_semver_git_tag_plugin,
     update_version_from_git_tag,
     _get_repo_name,
-    _get_repo_info
+    _get_repo_info,
+    _is_dirty,
+    _get_git_dir,
+    _get_tag_refs_digest,
+    _read_head_sha,
+    _read_tag_refs,
+    _RepoInfo,
+    _RepoSession,
+    _get_repo_class,
+    _get_session,
+    close_semver_git_tag_sessions,
+    check_changelog,
+    _check_changelog,
+    _get_changelog_files,
+    _get_reachable_tag_commits,
+    _get_reachable_tag_names,
+    _get_reachable_tag_names_by_walk,
+    _contains_sha,
+    _close_sessions,
+    _SESSIONS,
+    _clear_resident,
+    _get_refs_stamp,
+    _TagIndex,
+    _Metrics
+)
+from pybuilder_semver_git_tag.batch import (
+    main as batch_main,
+    resolve_repositories,
+    resolve_repository
+)
+from pybuilder_semver_git_tag.monorepo import (
+    main as monorepo_main,
+    resolve_versions
 )
 
 
@@ -134,6 +179,42 @@ class SeekLastTagTests(TestCase):
                 _TagInfo('v1.0.v2', 'commit2', version_prefix)]
         self.assertEqual(_seek_last_semver_tag(tags, '1.0.1'), None)
 
+    def test_semver_key_precedence(self):
+        """ SemVer keys should be ordered like semver.compare"""
+        versions = ['1.0.0-alpha', '1.0.0-alpha.1', '1.0.0-alpha.beta',
+                    '1.0.0-beta', '1.0.0-beta.2', '1.0.0-beta.11',
+                    '1.0.0-rc.1', '1.0.0', '1.0.1', '1.2.0', '1.10.0',
+                    '2.0.0-0', '2.0.0']
+        for i in range(15):
+            shuffle(versions)
+            tags = [_TagInfo(version, 'commit', '') for version in versions]
+            tags.sort(key=lambda tag: tag.semver_key)
+            for first, second in zip(tags, tags[1:]):
+                self.assertEqual(semver.compare(first.short, second.short), -1)
+
+    def test_semver_regex(self):
+        """ SemVer 2.0.0 is parsed without semver package"""
+        for version in ('0.0.0', '1.2.3-rc.1', '1.2.3-0a.1', '1.2.3+build.5',
+                        '10.20.30-alpha-1+001'):
+            self.assertNotEqual(_TagInfo(version, 'commit', '').semver_key,
+                                None, version)
+        for version in ('1.2', '01.2.3', '1.2.3-01', '1.2.3-', '1.2.3+',
+                        'v1.2.3', '1.2.3.4'):
+            self.assertEqual(_TagInfo(version, 'commit', '').semver_key,
+                             None, version)
+
+    def test_seek_last_two_tags(self):
+        """ Last and previous tags should be found in one pass"""
+        tags = [_TagInfo('v1.0.%s' % i, 'commit%s' % i, 'v')
+                for i in range(15)]
+        tags.append(_TagInfo('notsemver', 'commit', 'v'))
+        for i in range(15):
+            shuffle(tags)
+            last_tag, previous_tag = _seek_last_semver_tags(tags)
+            self.assertEqual(last_tag.name, 'v1.0.14')
+            self.assertEqual(previous_tag.name, 'v1.0.13')
+        self.assertEqual(_seek_last_semver_tags(tags[:0]), (None, None))
+
 
 class VersionFromGitTests(TestCase):
     """ Test plugin functionality    """
@@ -154,10 +235,14 @@ class VersionFromGitTests(TestCase):
             "Directory `basedir` isn't git repository root." in err_msg)
 
     @patch("pybuilder_semver_git_tag._get_repo_info",
-           return_value=([_TagInfo('not_semver2', 'commit2', ''),
-                          _TagInfo('not_semver1', 'commit1', '')],
-                         'last_commit', False))
-    def test_should_warning_if_semver_tag_not_found(self, mock_git_info):   # pylint: disable=invalid-name, unused-argument
+           return_value=_RepoInfo(
+               None, '',
+               tags=[_TagInfo('not_semver2', 'commit2', ''),
+                     _TagInfo('not_semver1', 'commit1', '')],
+               last_commit='last_commit', is_dirty=False))
+    @patch("pybuilder_semver_git_tag._is_shallow", return_value=False)
+    def test_should_warning_if_semver_tag_not_found(  # pylint: disable=invalid-name, unused-argument
+            self, mock_shallow, mock_git_info):
         """ Plugin should warning if SemVer tag wasn't found and return"""
         set_version_from_git_tag(self.project, self.logger)
         self.logger.warn.assert_called_once_with(
@@ -166,15 +251,28 @@ class VersionFromGitTests(TestCase):
         self.logger.info.assert_not_called()
 
     @patch("pybuilder_semver_git_tag._get_repo_info",
-           return_value=([_TagInfo('1.2.3', 'last_commit', ''),
-                          _TagInfo('not_semver1', 'commit1', '')],
-                         'last_commit', False))
+           return_value=_RepoInfo(
+               None, '',
+               tags=[_TagInfo('1.2.3', 'last_commit', ''),
+                     _TagInfo('not_semver1', 'commit1', '')],
+               last_commit='last_commit', is_dirty=False))
     def test_release_version_found(self, mock_git_info):    # pylint: disable=invalid-name, unused-argument
         """ Plugin should find release version"""
         set_version_from_git_tag(self.project, self.logger)
         self.assertEqual(self.logger.info.call_count, 2)
         self.assertEqual(self.project.version, '1.2.3')
 
+    @patch("pybuilder_semver_git_tag._get_repo_info",
+           return_value=_RepoInfo(
+               None, '',
+               tags=[_TagInfo('v1.2.3-rc.1', 'commit2', 'v')],
+               last_commit='last_commit', is_dirty=False))
+    def test_dev_version_with_prefix(self, mock_git_info):    # pylint: disable=invalid-name, unused-argument
+        """ Plugin should increment version from tag without prefix"""
+        self.project.set_property('semver_git_tag_version_prefix', 'v')
+        self.get_dev_version('patch')
+        self.assertEqual(self.project.version, '1.2.4.dev')
+
     def get_dev_version(self, increment_part):
         """ Util method which call set_version_from_git_tag
             with particular level of version increment part
@@ -184,9 +282,11 @@ class VersionFromGitTests(TestCase):
         set_version_from_git_tag(self.project, self.logger)
 
     @patch("pybuilder_semver_git_tag._get_repo_info",
-           return_value=([_TagInfo('1.2.3', 'last_commit', ''),
-                          _TagInfo('not_semver1', 'commit1', '')],
-                         'last_commit', True))
+           return_value=_RepoInfo(
+               None, '',
+               tags=[_TagInfo('1.2.3', 'last_commit', ''),
+                     _TagInfo('not_semver1', 'commit1', '')],
+               last_commit='last_commit', is_dirty=True))
     def test_dev_version_if_dirty(self, mock_git_info):     # pylint: disable=invalid-name, unused-argument
         """ Plugin should generate dev version if repo is dirty"""
         # Test `patch` part
@@ -209,9 +309,11 @@ class VersionFromGitTests(TestCase):
              "but `incorrect` passed.") in err_msg)
 
     @patch("pybuilder_semver_git_tag._get_repo_info",
-           return_value=([_TagInfo('1.2.3', 'commit2', ''),
-                          _TagInfo('not_semver1', 'commit1', '')],
-                         'last_commit', False))
+           return_value=_RepoInfo(
+               None, '',
+               tags=[_TagInfo('1.2.3', 'commit2', ''),
+                     _TagInfo('not_semver1', 'commit1', '')],
+               last_commit='last_commit', is_dirty=False))
     def test_dev_version_if_tagged_not_last_commit(self, mock_git_info):  # pylint: disable=invalid-name, unused-argument
         """ Plugin should generate dev version
             if repo had commit(s) after SemVer tagger commit
@@ -260,6 +362,37 @@ class UpdateVersionTests(TestCase):
             "be spoiled."
         )
 
+    @patch("pybuilder_semver_git_tag.set_version_from_git_tag")
+    @patch("pybuilder_semver_git_tag._get_repo_name",
+           return_value='repo_name')
+    def test_lazy_resolution(self, _get_repo_name,
+                             set_version_from_git_tag_mock):
+        """ Lazy mode should resolve name and version before prepare"""
+        self.project.set_property('semver_git_tag_lazy', 'True')
+        force_semver_git_tag_plugin(self.project, self.logger)
+        _get_repo_name.assert_not_called()
+        set_version_from_git_tag_mock.assert_not_called()
+        update_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.name, 'repo_name')
+        self.assertEqual(set_version_from_git_tag_mock.call_count, 1)
+        self.logger.warn.assert_not_called()
+        self.assertEqual(
+            self.project.get_property('dir_dist'),
+            '$dir_target/dist/repo_name-1.0.dev0')
+
+    @patch("pybuilder_semver_git_tag.set_version_from_git_tag")
+    @patch("pybuilder_semver_git_tag._get_repo_name",
+           return_value='repo_name')
+    def test_lazy_resolution_keeps_name(self, _get_repo_name,  # pylint: disable=invalid-name
+                                        set_version_from_git_tag_mock):  # pylint: disable=unused-argument
+        """ Lazy mode shouldn't override name from build.py"""
+        self.project.set_property('semver_git_tag_lazy', 'True')
+        force_semver_git_tag_plugin(self.project, self.logger)
+        self.project.name = 'build_py_name'
+        update_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.name, 'build_py_name')
+        _get_repo_name.assert_not_called()
+
 
 class _Remotes(object):  # pylint: disable=too-few-public-methods
     def __init__(self, name, url):
@@ -278,27 +411,143 @@ class _Tag(object):  # pylint: disable=too-few-public-methods
         self.commit = commit
 
 
+class _UnreadableTag(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def commit(self):
+        """ Commit of not SemVer tag shouldn't be dereferenced"""
+        raise AssertionError("Commit of tag %s was dereferenced" % self.name)
+
+
 class _Head(object):  # pylint: disable=too-few-public-methods
     def __init__(self, last_commit, prev_commits):
         self.commit = last_commit
         self.commits_list = prev_commits + [last_commit]
 
 
+class _Blob(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, blob_path, hexsha):
+        self.path = blob_path
+        self.hexsha = hexsha
+        self.type = 'blob'
+
+
+class _Tree(object):
+    """ Stub for git tree with blobs {path: sha}"""
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.lookups = []
+
+    def __truediv__(self, blob_path):
+        self.lookups.append(blob_path)
+        return _Blob(blob_path, self.blobs[blob_path])
+
+    __div__ = __truediv__
+
+    def traverse(self):
+        """ Stub for tree traverse"""
+        return [_Blob(blob_path, hexsha)
+                for blob_path, hexsha in sorted(self.blobs.items())]
+
+
+class _Process(object):  # pylint: disable=too-few-public-methods
+    """ Stub for git process with output lines"""
+    def __init__(self, output):
+        self.lines_read = 0
+        self.proc = Mock()
+        self.wait = Mock()
+        self.output = output
+
+    @property
+    def stdout(self):
+        """ Output lines as bytes"""
+        for line in self.output.splitlines():
+            self.lines_read += 1
+            yield line.encode('ascii') + b'\n'
+
+
+class _Git(object):  # pylint: disable=too-few-public-methods
+    def __init__(self, merged_tags=None, status=''):
+        self.merged_tags = merged_tags
+        self.head_tags = None
+        self.status_output = status
+        self.rev_list_output = ''
+        self.options = {}
+        self.repo = None
+
+    def __call__(self, **kwargs):
+        self.options = kwargs
+        return self
+
+    def rev_list(self, *args, **kwargs):
+        """ Stub for `git rev-list`"""
+        self.options.setdefault('rev_list', []).append(args)
+        if kwargs.get('as_process'):
+            self.process = _Process(self.rev_list_output)
+            return self.process
+        return self.rev_list_output
+
+    def cat_file(self, *args, **kwargs):
+        """ Stub for `git cat-file --batch-check` with peeled objects
+            of repository"""
+        self.options.setdefault('cat_file', []).append(args)
+        output = []
+        for line in kwargs['istream'].read().decode('ascii').splitlines():
+            sha = line[:-len('^{commit}')]
+            output.append('%s commit' % self.repo.peeled[sha]
+                          if sha in self.repo.peeled else '%s missing' % line)
+        return '\n'.join(output)
+
+    def status(self, *args):
+        """ Stub for `git status`"""
+        self.options['status'] = args
+        return self.status_output
+
+    def for_each_ref(self, *args):
+        """ Stub for `git for-each-ref --merged` and `--points-at`"""
+        if '--points-at' in args:
+            return '\n'.join('refs/tags/' + name for name in self.head_tags)
+        if self.merged_tags is None:
+            raise GitCommandError(['git', 'for-each-ref'] + list(args), 129)
+        return '\n'.join('refs/tags/' + name for name in self.merged_tags)
+
+
 class _Repo(object):     # pylint: disable=too-few-public-methods
-    def __init__(self, remotes=None, head=None, is_dirty=False, tags=None):
+    def __init__(self, remotes=None, head=None, is_dirty=False, tags=None,
+                 merged_tags=None):
         self.remotes = remotes if remotes else []
         self.dirty = is_dirty
         self.head = head
         self.tags = tags if tags else []
+        self.git = _Git(merged_tags)
+        self.git.repo = self
+        self.closed = False
+        self.peeled = {}
+        self.ancestor_checks = []
+        self.dirty_kwargs = None
 
-    def is_dirty(self):
+    def is_ancestor(self, ancestor_rev, rev):
+        """ Stub for is_ancestor. Only HEAD is supported"""
+        assert rev == 'HEAD'
+        self.ancestor_checks.append(ancestor_rev)
+        return ancestor_rev in [commit.hexsha
+                                for commit in self.head.commits_list]
+
+    def commit(self, rev):
+        """ Stub for commit"""
+        return _Commit(self.peeled[rev])
+
+    def close(self):
+        """ Stub for close"""
+        self.closed = True
+
+    def is_dirty(self, **kwargs):
         """ Stub for is_dirty flag"""
+        self.dirty_kwargs = kwargs
         return self.dirty
 
-    def iter_commits(self, rev=None):  # pylint: disable=no-self-use
-        """ Stub for iter_commits"""
-        return iter(rev.commits_list)
-
 
 class GetRepoNameTests(TestCase):
     """ Test _get_repo_name function"""
@@ -322,7 +571,7 @@ class GetRepoNameTests(TestCase):
     def test_get_name_from_origin(self, mock_get_repo):  # pylint: disable=unused-argument
         """Check that function correctly works with repositories with
                     origin remote"""
-        self.assertEqual(_get_repo_name(self.project, ''), 'pybuilder_semver_git_tag')
+        self.assertEqual(_get_repo_name(self.project, _RepoSession('basedir')), 'pybuilder_semver_git_tag')
 
     @patch("pybuilder_semver_git_tag._get_repo",
            return_value=(_Repo(remotes=[
@@ -336,14 +585,36 @@ class GetRepoNameTests(TestCase):
     def test_get_name_from_any_remote(self, mock_get_repo):  # pylint: disable=unused-argument
         """Check that function correctly works with repositories without
             origin remote"""
-        self.assertEqual(_get_repo_name(self.project, ''), 'pybuilder_semver_git_tag')
+        self.assertEqual(_get_repo_name(self.project, _RepoSession('basedir')), 'pybuilder_semver_git_tag')
 
     @patch("pybuilder_semver_git_tag._get_repo",
            return_value=(_Repo()))
     def test_get_name_from_no_remotes(self, mock_get_repo):  # pylint: disable=unused-argument
         """Check that function correctly works with repositories with
                     origin remote"""
-        self.assertEqual(_get_repo_name(self.project, ''), 'basedir')
+        self.assertEqual(_get_repo_name(self.project, _RepoSession('basedir')), 'basedir')
+
+
+def _get_test_repo(merged_tags=None):
+    repo = _Repo(
+        head=_Head(
+            last_commit=_Commit("shaforlastcommit"),
+            prev_commits=[_Commit("shaforfirstcommit"),
+                          _Commit("shaforsecondcommit"),
+                          _Commit("shaforthirdcommit")]),
+        tags=[_Tag('1.0.1', _Commit("shaforfirstcommit")),
+              _Tag('1.0.4', _Commit("shaforlastcommit")),
+              _Tag('2.0.0',
+                   _Commit("shaforcommitfromotherbranch")),
+              _UnreadableTag('deploy-1'),
+              _UnreadableTag('build-2')],
+        is_dirty=True,
+        merged_tags=merged_tags
+    )
+    repo.git.rev_list_output = '\n'.join(
+        ['shaforlastcommit', 'shaforthirdcommit',
+         'shaforsecondcommit', 'shaforfirstcommit'])
+    return repo
 
 
 class GetRepoInfoTests(TestCase):
@@ -353,24 +624,1339 @@ class GetRepoInfoTests(TestCase):
         self.project = Project("basedir")
         self.logger = Mock()
 
-    @patch("pybuilder_semver_git_tag._get_repo",
-           return_value=_Repo(
-               head=_Head(
-                   last_commit=_Commit("shaforlastcommit"),
-                   prev_commits=[_Commit("shaforfirstcommit"),
-                                 _Commit("shaforsecondcommit"),
-                                 _Commit("shaforthirdcommit")]),
-               tags=[_Tag('tag1', _Commit("shaforfirstcommit")),
-                     _Tag('tag4', _Commit("shaforlastcommit")),
-                     _Tag('tagotherbranch',
-                          _Commit("shaforcommitfromotherbranch"))],
-               is_dirty=True
-           ))
-    def test_get_info_for_active_branch(self, mock_get_repo):  # pylint: disable=unused-argument
-        """Check that function correctly returns tags for active branch"""
-        tags, last_commit, repo_is_dirty = _get_repo_info('', None)
+    def check_active_branch_info(self, repo_info):
+        """ Check info collected for active branch of test repo"""
+        tags, last_commit, repo_is_dirty = repo_info
         self.assertEqual(repo_is_dirty, True)
         self.assertEqual(last_commit.hexsha, 'shaforlastcommit')
         self.assertEqual(len(tags), 2)
         for tag in tags:
-            self.assertTrue(tag.name in ['tag1', 'tag4'])
+            self.assertTrue(tag.name in ['1.0.1', '1.0.4'])
+
+    @patch("pybuilder_semver_git_tag._get_repo",
+           return_value=_get_test_repo())
+    def test_get_info_for_active_branch(self, mock_get_repo):  # pylint: disable=unused-argument
+        """Check that function correctly returns tags for active branch"""
+        self.check_active_branch_info(_get_repo_info(_RepoSession(''), None, 'walk'))
+
+    @patch("pybuilder_semver_git_tag._get_repo",
+           return_value=_get_test_repo(
+               merged_tags=['1.0.1', '1.0.4', 'deploy-1']))
+    def test_get_info_with_merged_tags(self, mock_get_repo):  # pylint: disable=unused-argument
+        """Check that function takes tags merged into HEAD from git"""
+        repo_info = _get_repo_info(_RepoSession(''), None, 'merged')
+        self.check_active_branch_info(repo_info)
+
+    @patch("pybuilder_semver_git_tag._get_repo",
+           return_value=_get_test_repo(merged_tags=['1.0.1', '1.0.4']))
+    def test_get_info_skips_not_semver_tags(self, mock_get_repo):  # pylint: disable=invalid-name, unused-argument
+        """Check that function logs statistics of skipped tags"""
+        self.check_active_branch_info(
+            _get_repo_info(_RepoSession(''), '', 'merged', logger=self.logger))
+        self.logger.debug.assert_any_call(
+            "Git tags: 5 found, 0 skipped without version prefix, "
+            "2 skipped as not SemVer.")
+        self.logger.debug.assert_any_call(
+            "Git tags: 1 skipped as not reachable from HEAD.")
+
+    @patch("pybuilder_semver_git_tag._get_repo",
+           return_value=_get_test_repo(merged_tags=None))
+    def test_get_info_falls_back_to_walk(self, mock_get_repo):  # pylint: disable=unused-argument
+        """Check that function walks history if git can't list merged tags"""
+        self.check_active_branch_info(_get_repo_info(_RepoSession(''), None, 'merged'))
+
+    def test_walk_stops_at_last_tag_commit(self):  # pylint: disable=invalid-name
+        """Check that history walk stops when all tag commits are found"""
+        repo = _get_test_repo()
+        self.assertEqual(
+            _get_reachable_tag_names_by_walk(
+                repo, {'1.0.4': _Commit('shaforlastcommit'),
+                       '1.0.4-rc.1': 'shaforthirdcommit'}),
+            set(['1.0.4', '1.0.4-rc.1']))
+        self.assertEqual(repo.git.process.lines_read, 2)
+        repo.git.process.proc.kill.assert_called_once_with()
+        self.assertEqual(
+            _get_reachable_tag_names_by_walk(
+                repo, {'2.0.0': 'shaforcommitfromotherbranch'}),
+            set())
+        self.assertEqual(repo.git.process.lines_read, 4)
+        repo.git.process.wait.assert_called_once_with()
+
+    def test_get_info_top_down(self):
+        """Check that top-down search stops at the first reachable tag"""
+        repo = _get_test_repo()
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            tags, _, _ = _get_repo_info(_RepoSession(''), '', 'top-down')
+        self.assertEqual([tag.name for tag in tags], ['1.0.4'])
+        self.assertEqual(repo.ancestor_checks,
+                         ['shaforcommitfromotherbranch', 'shaforlastcommit'])
+
+    def test_get_info_top_down_with_limit(self):  # pylint: disable=invalid-name
+        """Check that top-down search could find previous release too"""
+        repo = _get_test_repo()
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            tags, _, _ = _get_repo_info(_RepoSession(''), '', 'top-down',
+                                        limit=2)
+        self.assertEqual([tag.name for tag in tags], ['1.0.1', '1.0.4'])
+
+    def test_dirty_not_checked_without_release_tag(self):  # pylint: disable=invalid-name
+        """Dirty flag shouldn't be checked if HEAD isn't tagged"""
+        repo = _get_test_repo(merged_tags=['1.0.1'])
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            _, _, repo_is_dirty = _get_repo_info(_RepoSession(''), '')
+        self.assertEqual(repo_is_dirty, None)
+        self.assertEqual(repo.dirty_kwargs, None)
+
+    def test_should_raise_if_reachability_incorrect(self):  # pylint: disable=invalid-name
+        """ Plugin should raise exception for unknown reachability mode"""
+        self.project.set_property('semver_git_tag_reachability', 'incorrect')
+        with self.assertRaises(BuildFailedException) as context:
+            set_version_from_git_tag(self.project, self.logger)
+        self.assertTrue(
+            "Incorrect value for `semver_git_tag_reachability` property. "
+            "Has to be in (`merged`, `walk`, `top-down`, `index`), "
+            "but `incorrect` passed."
+            in str(context.exception))
+
+
+class DirtyCheckTests(TestCase):
+    """ Test _is_dirty function"""
+
+    def test_dirty_check_modes(self):
+        """ Modes should be passed to GitPython"""
+        repo = _Repo(is_dirty=True)
+        self.assertTrue(_is_dirty(repo))
+        self.assertEqual(repo.dirty_kwargs, {
+            'index': True, 'working_tree': True, 'untracked_files': False})
+        self.assertTrue(_is_dirty(repo, 'index-only'))
+        self.assertEqual(repo.dirty_kwargs, {
+            'index': True, 'working_tree': False, 'untracked_files': False})
+        self.assertTrue(_is_dirty(repo, 'full'))
+        self.assertEqual(repo.dirty_kwargs, {
+            'index': True, 'working_tree': True, 'untracked_files': True})
+        repo.dirty_kwargs = None
+        self.assertFalse(_is_dirty(repo, 'off'))
+        self.assertEqual(repo.dirty_kwargs, None)
+
+    def test_dirty_check_with_status(self):
+        """ `git status` should be used with repository own config"""
+        repo = _Repo()
+        repo.git.status_output = '?? new_file\n'
+        self.assertTrue(_is_dirty(repo, 'full', True))
+        self.assertEqual(repo.git.options, {
+            'status': ('--porcelain', '--untracked-files=normal')})
+        repo.git.status_output = ''
+        self.assertFalse(_is_dirty(repo, 'index-and-worktree', True))
+        self.assertEqual(repo.git.options['status'],
+                         ('--porcelain', '--untracked-files=no'))
+
+
+class LazyResolutionTests(TestCase):
+    """ Test that resolution stages are evaluated on demand"""
+
+    def setUp(self):
+        self.project = Project("basedir")
+        initialize_semver_git_tag(self.project)
+        self.project.set_property('semver_git_tag_reachability', 'top-down')
+        self.project.set_property('semver_git_tag_changelog', 'CHANGELOG.md')
+        self.logger = Mock()
+
+    @patch("pybuilder_semver_git_tag._check_changelog")
+    def test_dev_build_does_minimum(self, check_changelog_mock):
+        """ Untagged HEAD: no dirty check, no changelog,
+            single ancestry check"""
+        repo = _get_test_repo()
+        repo.tags[1] = _Tag('1.0.4', _Commit("shaforthirdcommit"))
+        repo.git.head_tags = ['deploy-1']
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.0.5.dev')
+        self.assertEqual(len(repo.ancestor_checks), 2)
+        self.assertEqual(repo.dirty_kwargs, None)
+        check_changelog_mock.assert_not_called()
+
+    @patch("pybuilder_semver_git_tag._check_changelog")
+    def test_release_build_checks_all(self, check_changelog_mock):
+        """ Tagged HEAD: dirty check, previous release and changelog"""
+        repo = _get_test_repo()
+        repo.dirty = False
+        repo.git.head_tags = ['1.0.4']
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.0.4')
+        self.assertEqual(len(repo.ancestor_checks), 3)
+        self.assertNotEqual(repo.dirty_kwargs, None)
+        self.assertEqual(check_changelog_mock.call_args[0][5].name, '1.0.1')
+
+
+class VersionSourceTests(TestCase):
+    """ Test order of version sources"""
+
+    def setUp(self):
+        self.project = Project("basedir")
+        initialize_semver_git_tag(self.project)
+        self.logger = Mock()
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    def test_version_from_property(self, get_repo_mock):
+        """ Explicit version doesn't touch git"""
+        self.project.set_property('semver_git_tag_version', '3.2.1')
+        with patch.dict(os.environ, {'SEMVER_GIT_TAG_VERSION': '1.0.0'}):
+            set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '3.2.1')
+        get_repo_mock.assert_not_called()
+        self.assertTrue('(source: property)'
+                        in self.logger.info.call_args[0][0])
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    def test_version_from_environment(self, get_repo_mock):
+        """ Version from environment variable doesn't touch git"""
+        with patch.dict(os.environ, {'SEMVER_GIT_TAG_VERSION': '1.0.0'}):
+            set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.0.0')
+        get_repo_mock.assert_not_called()
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    def test_version_from_ci_tag(self, get_repo_mock):
+        """ Release version is taken from tag built by CI"""
+        self.project.set_property('semver_git_tag_ci_metadata', True)
+        self.project.set_property('semver_git_tag_version_prefix', 'v')
+        with patch.dict(os.environ, {'GITHUB_REF': 'refs/tags/v1.2.3'}):
+            set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, 'v1.2.3')
+        get_repo_mock.assert_not_called()
+        self.assertTrue('(source: CI metadata)'
+                        in self.logger.info.call_args[0][0])
+
+    def test_ci_metadata_falls_through_to_git(self):   # pylint: disable=invalid-name
+        """ CI metadata is ignored for branch builds, non-SemVer tags
+            and if it's disabled"""
+        cases = (
+            (True, {'GITHUB_REF': 'refs/heads/master'}),
+            (True, {'CI_COMMIT_TAG': 'deploy-1'}),
+            (False, {'CI_COMMIT_TAG': '2.0.0'}),
+        )
+        for enabled, environ in cases:
+            self.project.set_property('semver_git_tag_ci_metadata', enabled)
+            repo = _get_test_repo()
+            repo.dirty = False
+            with patch.dict(os.environ, environ), \
+                    patch("pybuilder_semver_git_tag._get_repo",
+                          return_value=repo):
+                set_version_from_git_tag(self.project, self.logger)
+            self.assertEqual(self.project.version, '1.0.4')
+            self.assertTrue('(source: git)'
+                            in self.logger.info.call_args[0][0])
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    def test_ci_metadata_skipped_for_changelog(self, get_repo_mock):   # pylint: disable=invalid-name
+        """ Changelog check needs git history"""
+        self.project.set_property('semver_git_tag_ci_metadata', True)
+        self.project.set_property('semver_git_tag_changelog', 'CHANGELOG.md')
+        get_repo_mock.side_effect = BuildFailedException('no repo')
+        with patch.dict(os.environ, {'TRAVIS_TAG': '1.2.3'}):
+            with self.assertRaises(BuildFailedException):
+                set_version_from_git_tag(self.project, self.logger)
+
+
+class ChangelogCheckTests(TestCase):
+    """ Test changelog check with blobs into tag trees"""
+
+    def setUp(self):
+        self.repo = _Repo()
+        self.repo.working_tree_dir = path.join(os.sep, 'repo')
+        self.trees = {
+            'prev': _Tree({'CHANGELOG.md': 'a1', 'docs/NEWS.rst': 'b1'}),
+            'last': _Tree({'CHANGELOG.md': 'a1', 'docs/NEWS.rst': 'b2',
+                           'docs/HISTORY.rst': 'c1'})}
+        self.repo.commit = lambda sha: Mock(tree=self.trees[sha])
+        self.session = Mock(repo=self.repo, metrics=_Metrics())
+        self.tags = [_TagInfo('1.0.0', 'prev', ''),
+                     _TagInfo('1.1.0', 'last', '')]
+        self.logger = Mock()
+
+    def check(self, changelog_files):
+        """ Check changelog for tag 1.1.0"""
+        _check_changelog(changelog_files, self.session, self.tags[1],
+                         self.tags, self.logger)
+
+    def test_first_release(self):
+        """ Check is skipped without previous release tag"""
+        _check_changelog('CHANGELOG.md', self.session, self.tags[1],
+                         self.tags[1:], self.logger)
+        self.assertTrue('is skipped' in self.logger.warn.call_args[0][0])
+
+    def test_check_with_repo_path(self):
+        """ Public function takes repository path and closes repository"""
+        with patch("pybuilder_semver_git_tag._get_repo",
+                   return_value=self.repo):
+            check_changelog(path.join(os.sep, 'repo', 'docs', 'NEWS.rst'),
+                            path.join(os.sep, 'repo'), self.tags[1],
+                            self.tags, self.logger)
+            self.assertRaises(BuildFailedException, check_changelog,
+                              path.join(os.sep, 'repo', 'CHANGELOG.md'),
+                              path.join(os.sep, 'repo'), self.tags[1],
+                              self.tags, self.logger)
+        self.assertTrue(self.repo.closed)
+
+    def test_unchanged_file(self):
+        """ Same blob into both trees should raise BuildFailedException"""
+        with self.assertRaises(BuildFailedException) as context:
+            self.check(path.join(os.sep, 'repo', 'CHANGELOG.md'))
+        self.assertTrue('1.0.0' in str(context.exception))
+        self.assertEqual(self.trees['last'].lookups, ['CHANGELOG.md'])
+
+    def test_changed_file(self):
+        """ Different blobs mean changed changelog"""
+        self.check(path.join(os.sep, 'repo', 'docs', 'NEWS.rst'))
+
+    def test_missing_file(self):
+        """ Changelog absent into both trees isn't changed"""
+        with self.assertRaises(BuildFailedException):
+            self.check(['CHANGELOG.md', 'NEWS.md'])
+
+    def test_several_files_and_patterns(self):   # pylint: disable=invalid-name
+        """ Any changed or added file from list or pattern is enough"""
+        self.check(['CHANGELOG.md', 'docs/*.rst'])
+        self.check(['CHANGELOG.md', 'docs/HISTORY.rst'])
+        with self.assertRaises(BuildFailedException):
+            self.check(['CHANGELOG.md', '*.md'])
+
+    def test_changelog_property(self):
+        """ Property could contain comma-separated paths"""
+        project = Project(path.join(os.sep, 'repo'))
+        project.set_property('semver_git_tag_changelog',
+                             'CHANGELOG.md, docs/*.rst')
+        self.assertEqual(
+            _get_changelog_files(project),
+            [path.join(os.sep, 'repo', 'CHANGELOG.md'),
+             path.join(os.sep, 'repo', 'docs', '*.rst')])
+
+
+class MetricsTests(TestCase):
+    """ Test timers and counters of resolution"""
+
+    def setUp(self):
+        self.project = Project(mkdtemp())
+        initialize_semver_git_tag(self.project)
+        self.project.set_property('dir_reports', 'target/reports')
+        self.logger = Mock()
+        self.repo = _get_test_repo(merged_tags=None)
+
+    def tearDown(self):
+        _close_sessions()
+        rmtree(self.project.basedir)
+
+    def resolve(self):
+        """ Resolve name and version with build session"""
+        with patch("pybuilder_semver_git_tag._get_repo",
+                   return_value=self.repo):
+            force_semver_git_tag_plugin(self.project, self.logger)
+        return _get_session(self.project.basedir)
+
+    def test_counters_and_timers(self):
+        """ Resolution phases are timed and git work is counted"""
+        metrics = self.resolve().metrics
+        self.assertEqual(metrics.counters['tags_seen'], 5)
+        self.assertEqual(metrics.counters['tags_semver'], 3)
+        self.assertEqual(metrics.counters['commits_walked'], 4)
+        for phase in ('name', 'version', 'repo_open', 'tag_listing',
+                      'reachability', 'head'):
+            self.assertTrue(phase in metrics.timers, phase)
+        self.assertTrue(metrics.total > 0)
+
+    def test_git_processes_counted(self):
+        """ Git processes started by GitPython are counted"""
+        metrics = _Metrics()
+        git_command = _get_repo_class().GitCommandWrapperType(mkdtemp())
+        metrics.count_git_processes(Mock(git=git_command))
+        self.assertTrue(git_command.version().startswith('git version'))
+        self.assertEqual(metrics.counters['git_processes'], 1)
+
+    def test_total_is_wall_clock(self):
+        """ Nested phases are counted once in total"""
+        metrics = _Metrics()
+        with metrics.timer('name'):
+            with metrics.timer('version'):
+                time.sleep(0.01)
+        self.assertTrue(metrics.total >= metrics.timers['version'])
+        self.assertTrue(metrics.total <
+                        metrics.timers['name'] + metrics.timers['version'])
+
+    def test_report_written_on_finalize(self):
+        """ JSON report is written into reports directory"""
+        self.project.set_property('semver_git_tag_metrics_report', True)
+        self.resolve()
+        close_semver_git_tag_sessions(self.project, self.logger)
+        report_file = path.join(self.project.basedir, 'target', 'reports',
+                                'semver_git_tag_metrics.json')
+        with open(report_file) as report_content:
+            report = json.load(report_content)
+        self.assertEqual(
+            report[self.project.basedir]['counters']['tags_seen'], 5)
+
+    def test_time_budget(self):
+        """ Build fails if resolution exceeds time budget"""
+        session = self.resolve()
+        self.project.set_property('semver_git_tag_time_budget', '10')
+        update_version_from_git_tag(self.project, self.logger)
+        session.metrics.total = 11.0
+        with self.assertRaises(BuildFailedException) as context:
+            update_version_from_git_tag(self.project, self.logger)
+        self.assertTrue('exceeds time budget 10.0 s' in str(context.exception))
+
+    def test_report_written_on_failure(self):
+        """ Report is written for failed build: finalizer isn't run"""
+        self.project.set_property('semver_git_tag_metrics_report', True)
+        self.resolve().metrics.total = 11.0
+        self.project.set_property('semver_git_tag_time_budget', '10')
+        self.assertRaises(BuildFailedException, update_version_from_git_tag,
+                          self.project, self.logger)
+        report_file = path.join(self.project.basedir, 'target', 'reports',
+                                'semver_git_tag_metrics.json')
+        with open(report_file) as report_content:
+            report = json.load(report_content)
+        self.assertEqual(report[self.project.basedir]['total'], 11.0)
+
+
+class RepoSessionTests(TestCase):
+    """ Test _RepoSession and build sessions"""
+
+    def setUp(self):
+        self.logger = Mock()
+
+    @patch("pybuilder_semver_git_tag._get_repo", side_effect=lambda _: _Repo())
+    def test_repo_opened_once(self, mock_get_repo):
+        """ Session should open repo only once and close it"""
+        session = _RepoSession('')
+        repo = session.repo
+        self.assertTrue(session.repo is repo)
+        self.assertEqual(mock_get_repo.call_count, 1)
+        session.close()
+        self.assertTrue(repo.closed)
+        self.assertFalse(session.repo is repo)
+
+    @patch("pybuilder_semver_git_tag._get_repo", side_effect=lambda _: _Repo())
+    def test_build_sessions_closed_on_finalize(self, mock_get_repo):  # pylint: disable=invalid-name, unused-argument
+        """ Build session should be shared and closed by finalizer"""
+        session = _get_session('some_path')
+        self.assertTrue(_get_session('some_path') is session)
+        repo = session.repo
+        close_semver_git_tag_sessions(Project("basedir"), self.logger)
+        self.assertTrue(repo.closed)
+        self.assertFalse(_get_session('some_path') is session)
+        close_semver_git_tag_sessions(Project("basedir"), self.logger)
+
+    def test_sessions_closed_on_error(self):
+        """ Failed resolution closes sessions: finalizer isn't run"""
+        def fail(session, *args):   # pylint: disable=unused-argument
+            """ Git query failed after repository was opened"""
+            _ = session.repo
+            raise BuildFailedException("git failed")
+        project = Project("basedir")
+        project.set_property('semver_git_tag_project_name', 'name')
+        for hook in (force_semver_git_tag_plugin,
+                     update_version_from_git_tag):
+            repo = _Repo()
+            with patch("pybuilder_semver_git_tag._get_repo",
+                       return_value=repo), \
+                    patch("pybuilder_semver_git_tag._get_repo_info",
+                          side_effect=fail):
+                self.assertRaises(BuildFailedException, hook,
+                                  project, self.logger)
+            self.assertTrue(repo.closed)
+            self.assertFalse('basedir' in _SESSIONS)
+
+    @patch("pybuilder_semver_git_tag._get_repo_info",
+           return_value=_RepoInfo(
+               None, '',
+               tags=[_TagInfo('1.2.3', 'last_commit', '')],
+               last_commit='last_commit', is_dirty=False))
+    @patch("pybuilder_semver_git_tag._get_repo", side_effect=lambda _: _Repo())
+    def test_one_repo_for_build(self, mock_get_repo, mock_git_info):  # pylint: disable=unused-argument
+        """ Plugin should open repository once for name and version"""
+        project = Project("basedir")
+        force_semver_git_tag_plugin(project, self.logger)
+        project.set_property('semver_git_tag_increment_part', 'minor')
+        update_version_from_git_tag(project, self.logger)
+        self.assertEqual(mock_get_repo.call_count, 1)
+        self.assertEqual(mock_git_info.call_count, 2)
+        close_semver_git_tag_sessions(project, self.logger)
+
+
+def _write_file(file_path, content):
+    if not path.isdir(path.dirname(file_path)):
+        makedirs(path.dirname(file_path))
+    with open(file_path, 'w') as file_content:
+        file_content.write(content)
+
+
+class _GitDirTestCase(TestCase):
+    """ Base class for tests which need fake git directory"""
+    head_sha = 'a' * 40
+
+    def setUp(self):
+        self.repo_dir = mkdtemp()
+        self.git_dir = path.join(self.repo_dir, '.git')
+        _write_file(path.join(self.git_dir, 'HEAD'), 'ref: refs/heads/master\n')
+        _write_file(path.join(self.git_dir, 'refs', 'heads', 'master'),
+                    self.head_sha + '\n')
+        _write_file(path.join(self.git_dir, 'refs', 'tags', '1.2.3'),
+                    self.head_sha + '\n')
+        self.project = Project(self.repo_dir)
+        self.logger = Mock()
+
+    def tearDown(self):
+        rmtree(self.repo_dir)
+
+
+class RealGitTests(TestCase):
+    """ Test git queries with real git repository
+        and user configuration which changes `git tag` output"""
+
+    def setUp(self):
+        self.repo_dir = mkdtemp()
+        self.git('init', '-q')
+        self.git('config', 'column.ui', 'always')
+        self.project = Project(self.repo_dir)
+        initialize_semver_git_tag(self.project)
+        self.logger = Mock()
+
+    def tearDown(self):
+        _close_sessions()
+        rmtree(self.repo_dir)
+
+    def git(self, *args):
+        """ Run git into test repository"""
+        process = Popen(['git', '-c', 'user.name=Test',
+                         '-c', 'user.email=test@example.com'] + list(args),
+                        cwd=self.repo_dir, stdout=PIPE, stderr=PIPE)
+        _, stderr = process.communicate()
+        self.assertEqual(process.returncode, 0, stderr)
+
+    def commit(self, *tags):
+        """ Commit changed file and tag it"""
+        with open(path.join(self.repo_dir, 'file.txt'), 'a') as file_content:
+            file_content.write('change\n')
+        self.git('add', 'file.txt')
+        self.git('commit', '-q', '-m', 'change')
+        for tag in tags:
+            self.git('tag', tag)
+
+    def test_head_tags_ignore_columns(self):
+        """ Tags of HEAD aren't spoiled by `column.ui`: previous release
+            tag is collected for changelog check with `top-down`"""
+        self.commit('1.1.0')
+        self.commit('1.2.0', '1.2.0-rc.1')
+        self.project.set_property('semver_git_tag_reachability', 'top-down')
+        self.project.set_property('semver_git_tag_changelog', 'CHANGELOG.md')
+        with self.assertRaises(BuildFailedException) as context:
+            set_version_from_git_tag(self.project, self.logger)
+        self.assertTrue('Not found changes' in str(context.exception))
+
+    def test_merged_tags_ignore_columns(self):
+        """ Reachable tags aren't spoiled by `column.ui`"""
+        self.commit('1.0.0', 'deploy-1')
+        self.commit('1.2.0')
+        self.commit()
+        session = _RepoSession(self.repo_dir)
+        self.assertEqual(_get_reachable_tag_names(session.repo),
+                         set(['1.0.0', '1.2.0', 'deploy-1']))
+        session.close()
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.2.1.dev')
+
+
+class GitDirReadTests(_GitDirTestCase):
+    """ Test reading git directory without git"""
+
+    def test_read_head_from_loose_ref(self):
+        """ HEAD should be resolved via loose branch ref"""
+        self.assertEqual(_read_head_sha(_get_git_dir(self.repo_dir)),
+                         self.head_sha)
+
+    def test_read_head_from_packed_refs(self):
+        """ HEAD should be resolved via packed-refs"""
+        _write_file(path.join(self.git_dir, 'HEAD'), 'ref: refs/heads/packed')
+        _write_file(path.join(self.git_dir, 'packed-refs'),
+                    '# pack-refs with: peeled fully-peeled sorted \n'
+                    '%s refs/heads/packed\n' % ('b' * 40))
+        self.assertEqual(_read_head_sha(self.git_dir), 'b' * 40)
+
+    def test_read_detached_head(self):
+        """ Detached HEAD contains sha itself"""
+        _write_file(path.join(self.git_dir, 'HEAD'), 'c' * 40)
+        self.assertEqual(_read_head_sha(self.git_dir), 'c' * 40)
+
+    def test_git_dir_from_file(self):
+        """ `.git` could be a file with link to git directory"""
+        worktree_dir = mkdtemp()
+        try:
+            _write_file(path.join(worktree_dir, '.git'),
+                        'gitdir: %s\n' % self.git_dir)
+            self.assertEqual(_get_git_dir(worktree_dir), self.git_dir)
+        finally:
+            rmtree(worktree_dir)
+
+    def test_tag_refs_digest_changes(self):
+        """ Digest should be changed with new tag"""
+        digest = _get_tag_refs_digest(self.git_dir)
+        self.assertEqual(digest, _get_tag_refs_digest(self.git_dir))
+        _write_file(path.join(self.git_dir, 'refs', 'tags', '1.2.4'),
+                    self.head_sha + '\n')
+        self.assertNotEqual(digest, _get_tag_refs_digest(self.git_dir))
+
+
+class RepoNameFromConfigTests(_GitDirTestCase):
+    """ Test repository name from git config without GitPython"""
+
+    def setUp(self):
+        super(RepoNameFromConfigTests, self).setUp()
+        initialize_semver_git_tag(self.project)
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    def test_origin_from_config(self, mock_get_repo):
+        """ Origin is preferred, quotes, comments and
+            legacy sections are supported"""
+        _write_file(path.join(self.git_dir, 'config'), '\n'.join([
+            '[core]',
+            '\tbare = false',
+            '[remote.fork]',
+            '\turl = https://host/fork/fork_name.git',
+            '[remote "origin"]',
+            '\turl = "https://host/group/origin_name.git" ; comment',
+            '\turl = https://host/group/push_only.git',
+            '\tfetch = +refs/heads/*:refs/remotes/origin/*']))
+        self.assertEqual(
+            _get_repo_name(self.project, _RepoSession(self.repo_dir)),
+            'origin_name')
+        mock_get_repo.assert_not_called()
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    def test_remote_from_include(self, mock_get_repo):
+        """ Remotes are taken from included config files"""
+        _write_file(path.join(self.git_dir, 'config'),
+                    '[include]\n\tpath = remotes.config\n')
+        _write_file(path.join(self.git_dir, 'remotes.config'),
+                    '[remote "upstream"]\n'
+                    '\turl = git@host:group/upstream_name.git\n')
+        self.assertEqual(
+            _get_repo_name(self.project, _RepoSession(self.repo_dir)),
+            'upstream_name')
+        mock_get_repo.assert_not_called()
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    def test_conditional_include_uses_gitpython(self, mock_get_repo):  # pylint: disable=invalid-name
+        """ GitPython is used for `includeIf`"""
+        _write_file(path.join(self.git_dir, 'config'),
+                    '[includeIf "gitdir:~/work/"]\n\tpath = work.config\n')
+        mock_get_repo.return_value = _Repo(remotes=[
+            _Remotes('origin', 'https://host/group/gitpython_name.git')])
+        self.assertEqual(
+            _get_repo_name(self.project, _RepoSession(self.repo_dir)),
+            'gitpython_name')
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    def test_name_without_remotes(self, mock_get_repo):
+        """ Directory name without remotes, explicit name has priority"""
+        self.assertEqual(
+            _get_repo_name(self.project, _RepoSession(self.repo_dir)),
+            path.basename(self.project.basedir))
+        self.project.set_property('semver_git_tag_project_name', 'explicit')
+        self.assertEqual(
+            _get_repo_name(self.project, _RepoSession(self.repo_dir)),
+            'explicit')
+        mock_get_repo.assert_not_called()
+
+
+class VersionCacheTests(_GitDirTestCase):
+    """ Test persistent version resolution cache"""
+
+    def setUp(self):
+        super(VersionCacheTests, self).setUp()
+        initialize_semver_git_tag(self.project)
+        self.project.set_property('semver_git_tag_cache', 'True')
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    @patch("pybuilder_semver_git_tag._get_repo_info")
+    def test_dev_version_from_cache(self, mock_git_info, mock_get_repo):
+        """ Second resolution for dev version shouldn't touch git at all"""
+        mock_git_info.return_value = _RepoInfo(
+            None, '', tags=[_TagInfo('1.2.3', 'b' * 40, '')],
+            last_commit=self.head_sha, is_dirty=False)
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.2.4.dev')
+        self.assertTrue(
+            path.isfile(path.join(self.git_dir, 'semver_git_tag_cache.json')))
+        self.project.version = '0.0.0'
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.2.4.dev')
+        self.assertEqual(mock_git_info.call_count, 1)
+        mock_get_repo.assert_not_called()
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    @patch("pybuilder_semver_git_tag._get_repo_info")
+    def test_release_from_cache_checks_dirty(self, mock_git_info,  # pylint: disable=invalid-name
+                                             mock_get_repo):
+        """ Cached release resolution still has to check dirty flag"""
+        mock_git_info.return_value = _RepoInfo(
+            None, '', tags=[_TagInfo('1.2.3', self.head_sha, '')],
+            last_commit=self.head_sha, is_dirty=False)
+        mock_get_repo.return_value = _Repo(is_dirty=True)
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.2.3')
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.2.4.dev')
+        self.assertEqual(mock_git_info.call_count, 1)
+
+    @patch("pybuilder_semver_git_tag._check_changelog")
+    def test_cache_keyed_with_changelog(self, check_changelog_mock):
+        """ Top-down collects previous release tag only for changelog
+            check, so cached tags without it can't be reused"""
+        self.project.set_property('semver_git_tag_reachability', 'top-down')
+        repo = _get_test_repo()
+        repo.dirty = False
+        repo.git.head_tags = ['1.0.4']
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            set_version_from_git_tag(self.project, self.logger)
+            self.project.set_property('semver_git_tag_changelog',
+                                      'CHANGELOG.md')
+            set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.0.4')
+        self.assertEqual(check_changelog_mock.call_args[0][5].name, '1.0.1')
+
+    @patch("pybuilder_semver_git_tag._get_repo_info")
+    def test_cache_invalidated_with_new_tag(self, mock_git_info):  # pylint: disable=invalid-name
+        """ Any change of tag refs should invalidate cache"""
+        mock_git_info.return_value = _RepoInfo(
+            None, '', tags=[_TagInfo('1.2.3', 'b' * 40, '')],
+            last_commit=self.head_sha, is_dirty=False)
+        set_version_from_git_tag(self.project, self.logger)
+        _write_file(path.join(self.git_dir, 'refs', 'tags', '1.3.0'),
+                    'b' * 40 + '\n')
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(mock_git_info.call_count, 2)
+
+
+class ResidentResolverTests(_GitDirTestCase):
+    """ Test resident resolution for repeated builds in one process"""
+
+    def setUp(self):
+        super(ResidentResolverTests, self).setUp()
+        initialize_semver_git_tag(self.project)
+        self.project.set_property('semver_git_tag_resident', 'True')
+        _clear_resident()
+
+    def tearDown(self):
+        _clear_resident()
+        super(ResidentResolverTests, self).tearDown()
+
+    def _replace_ref(self, ref_name, sha):
+        """ Rewrite ref like git does: lock file and rename"""
+        ref_file = path.join(self.git_dir, ref_name)
+        _write_file(ref_file + '.lock', sha + '\n')
+        os.rename(ref_file + '.lock', ref_file)
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    @patch("pybuilder_semver_git_tag._get_repo_info")
+    def test_dev_version_is_resident(self, mock_git_info, mock_get_repo):
+        """ Repeated resolution of dev version shouldn't touch git"""
+        mock_git_info.return_value = _RepoInfo(
+            None, '', tags=[_TagInfo('1.2.3', 'b' * 40, '')],
+            last_commit=self.head_sha, is_dirty=False)
+        set_version_from_git_tag(self.project, self.logger)
+        self.project.version = '0.0.0'
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.2.4.dev')
+        self.assertTrue('(source: resident)'
+                        in self.logger.info.call_args[0][0])
+        self.assertEqual(mock_git_info.call_count, 1)
+        mock_get_repo.assert_not_called()
+        # new commit on current branch
+        self._replace_ref(path.join('refs', 'heads', 'master'), 'c' * 40)
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(mock_git_info.call_count, 2)
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    @patch("pybuilder_semver_git_tag._get_repo_info")
+    def test_next_build_in_process(self, mock_git_info, mock_get_repo):  # pylint: disable=unused-argument
+        """ Next build of long-lived process doesn't pass import stage,
+            its version is resolved before `prepare` from resident"""
+        mock_git_info.return_value = _RepoInfo(
+            None, '', tags=[_TagInfo('1.2.3', 'b' * 40, '')],
+            last_commit=self.head_sha, is_dirty=False)
+        self.project.set_property('semver_git_tag_project_name', 'name')
+        force_semver_git_tag_plugin(self.project, self.logger)
+        update_version_from_git_tag(self.project, self.logger)
+        close_semver_git_tag_sessions(self.project, self.logger)
+        project = Project(self.repo_dir)
+        initialize_semver_git_tag(project)
+        project.set_property('semver_git_tag_resident', True)
+        project.set_property('semver_git_tag_project_name', 'name')
+        logger = Mock()
+        update_version_from_git_tag(project, logger)
+        close_semver_git_tag_sessions(project, logger)
+        self.assertEqual((project.name, project.version), ('name', '1.2.4.dev'))
+        self.assertTrue(any('(source: resident)' in call[0][0]
+                            for call in logger.info.call_args_list))
+        logger.warn.assert_not_called()
+        self.assertEqual(mock_git_info.call_count, 1)
+
+    @patch("pybuilder_semver_git_tag._get_repo")
+    @patch("pybuilder_semver_git_tag._get_repo_info")
+    def test_resident_release_checks_dirty(self, mock_git_info,  # pylint: disable=invalid-name
+                                           mock_get_repo):
+        """ Worktree changes don't touch refs - dirty flag is checked again"""
+        mock_git_info.return_value = _RepoInfo(
+            None, '', tags=[_TagInfo('1.2.3', self.head_sha, '')],
+            last_commit=self.head_sha, is_dirty=False)
+        mock_get_repo.return_value = _Repo(is_dirty=True)
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.2.3')
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.2.4.dev')
+        self.assertEqual(mock_git_info.call_count, 1)
+
+    @patch("pybuilder_semver_git_tag._get_repo_info")
+    def test_resident_invalidation(self, mock_git_info):
+        """ Tag refs and version-related properties invalidate resolution"""
+        mock_git_info.return_value = _RepoInfo(
+            None, '', tags=[_TagInfo('1.2.3', 'b' * 40, '')],
+            last_commit=self.head_sha, is_dirty=False)
+        set_version_from_git_tag(self.project, self.logger)
+        _write_file(path.join(self.git_dir, 'refs', 'tags', '1.3.0'),
+                    'b' * 40 + '\n')
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(mock_git_info.call_count, 2)
+        self._replace_ref(path.join('refs', 'tags', '1.3.0'), 'd' * 40)
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(mock_git_info.call_count, 3)
+        self.project.set_property('semver_git_tag_increment_part', 'minor')
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(self.project.version, '1.3.0.dev')
+        self.assertEqual(mock_git_info.call_count, 4)
+
+    def test_worktree_stamp_with_shallow(self):
+        """ Shallow boundary of worktree is stamped in common dir"""
+        worktree_dir = path.join(self.git_dir, 'worktrees', 'other')
+        _write_file(path.join(worktree_dir, 'HEAD'), self.head_sha + '\n')
+        _write_file(path.join(worktree_dir, 'commondir'), '../..\n')
+        stamp = _get_refs_stamp(worktree_dir)
+        _write_file(path.join(self.git_dir, 'shallow'), self.head_sha + '\n')
+        self.assertNotEqual(_get_refs_stamp(worktree_dir), stamp)
+
+    @patch("pybuilder_semver_git_tag._get_repo_info")
+    def test_resident_is_disabled_by_default(self, mock_git_info):  # pylint: disable=invalid-name
+        """ Without property each resolution reads git"""
+        self.project.set_property('semver_git_tag_resident', False)
+        mock_git_info.return_value = _RepoInfo(
+            None, '', tags=[_TagInfo('1.2.3', 'b' * 40, '')],
+            last_commit=self.head_sha, is_dirty=False)
+        set_version_from_git_tag(self.project, self.logger)
+        set_version_from_git_tag(self.project, self.logger)
+        self.assertEqual(mock_git_info.call_count, 2)
+
+
+class ShallowCloneTests(_GitDirTestCase):
+    """ Test resolution for shallow clone"""
+
+    def setUp(self):
+        super(ShallowCloneTests, self).setUp()
+        initialize_semver_git_tag(self.project)
+        _write_file(path.join(self.git_dir, 'shallow'), 'c' * 40 + '\n')
+        self.repo = _get_test_repo(merged_tags=[])
+        self.repo.dirty = False
+        self.fetches = []
+
+    def fetch(self, *args):
+        """ Stub for `git fetch --deepen`: boundary moves with each
+            attempt, tag 1.0.1 is fetched with second attempt
+            and history becomes complete"""
+        self.fetches.append(args)
+        if len(self.fetches) == 2:
+            self.repo.git.merged_tags = ['1.0.1']
+            os.remove(path.join(self.git_dir, 'shallow'))
+        else:
+            _write_file(path.join(self.git_dir, 'shallow'),
+                        '%040d\n' % len(self.fetches))
+
+    def resolve(self, strategy):
+        """ Resolve version with particular shallow strategy"""
+        self.project.set_property('semver_git_tag_shallow_strategy', strategy)
+        with patch("pybuilder_semver_git_tag._get_repo",
+                   return_value=self.repo):
+            set_version_from_git_tag(self.project, self.logger)
+
+    def test_off_only_warns(self):
+        """ Default strategy doesn't fetch"""
+        self.repo.git.fetch = self.fetch
+        self.resolve('off')
+        self.assertEqual(self.fetches, [])
+        self.assertEqual(self.logger.warn.call_count, 2)
+
+    def test_deepen_until_semver_tag(self):
+        """ History is deepened with doubled depth until SemVer tag"""
+        self.repo.git.fetch = self.fetch
+        self.resolve('deepen')
+        self.assertEqual(self.fetches, [('--deepen=64',), ('--deepen=128',)])
+        self.assertEqual(self.project.version, '1.0.2.dev')
+
+    def test_deepen_stops_if_boundary_unchanged(self):   # pylint: disable=invalid-name
+        """ Fetch from shallow remote doesn't deepen history"""
+        self.repo.git.fetch = self.fetches.append
+        self.resolve('deepen')
+        self.assertEqual(self.fetches, ['--deepen=64'])
+        self.assertTrue('wasn\'t deepened'
+                        in self.logger.warn.call_args_list[-2][0][0])
+
+    def test_deepen_attempts_are_limited(self):   # pylint: disable=invalid-name
+        """ Depth isn't doubled forever"""
+        def fetch(*args):
+            """ Boundary moves, but SemVer tag isn't found"""
+            self.fetches.append(args)
+            _write_file(path.join(self.git_dir, 'shallow'),
+                        '%040d\n' % len(self.fetches))
+        self.repo.git.fetch = fetch
+        self.resolve('deepen')
+        self.assertEqual(len(self.fetches), 10)
+        self.assertEqual(self.fetches[-1], ('--deepen=32768',))
+
+    def test_date_takes_tags_created_before_head(self):   # pylint: disable=invalid-name
+        """ Tags created later than HEAD commit are skipped"""
+        self.repo.head.commit.committed_date = 2000
+        self.repo.git.for_each_ref = lambda *args: '\n'.join([
+            'refs/tags/1.0.1\t1000\t\t' + 'a' * 40,
+            'refs/tags/1.0.4\t1500\t' + 'b' * 40 + '\t' + 'd' * 40,
+            'refs/tags/2.0.0\t3000\t\t' + 'e' * 40,
+            'refs/tags/deploy-1\t1800\t\t' + 'f' * 40])
+        self.resolve('date')
+        self.assertEqual(self.project.version, '1.0.5.dev')
+
+    def test_full_clone_isnt_deepened(self):
+        """ Shallow strategy is applied only for shallow clone"""
+        os.remove(path.join(self.git_dir, 'shallow'))
+        self.repo.git.fetch = self.fetch
+        self.resolve('deepen')
+        self.assertEqual(self.fetches, [])
+
+    def test_incorrect_strategy(self):
+        """ Incorrect strategy should raise BuildFailedException"""
+        with self.assertRaises(BuildFailedException):
+            self.resolve('unshallow')
+
+
+class ReachabilityIndexTests(_GitDirTestCase):
+    """ Test persistent index of commits reachable from HEAD"""
+
+    def setUp(self):
+        super(ReachabilityIndexTests, self).setUp()
+        commits = [_Commit(char * 40) for char in '1234']
+        self.repo = _Repo(head=_Head(commits[-1], commits[:-1]))
+        self.repo.git.rev_list_output = '\n'.join(
+            commit.hexsha for commit in commits)
+        self.session = Mock(repo=self.repo, git_dir=self.git_dir,
+                            metrics=_Metrics())
+        self.tag_refs = {'1.0.1': _Tag('1.0.1', commits[0]),
+                         '2.0.0': _Tag('2.0.0', _Commit('e' * 40))}
+
+    def get_reachable(self):
+        """ Names of reachable tags with `index` reachability"""
+        return set(_get_reachable_tag_commits(
+            self.session, 'gitpython', self.tag_refs, set(self.tag_refs),
+            'index'))
+
+    def test_index_is_updated_incrementally(self):   # pylint: disable=invalid-name
+        """ Only commits since indexed HEAD are listed"""
+        self.assertEqual(self.get_reachable(), set(['1.0.1']))
+        self.assertTrue(path.isfile(
+            path.join(self.git_dir, 'semver_git_tag_reachability.idx')))
+        # HEAD isn't changed - no git calls
+        self.assertEqual(self.get_reachable(), set(['1.0.1']))
+        self.assertEqual(len(self.repo.git.options['rev_list']), 1)
+        # new commit
+        new_head = _Commit('5' * 40)
+        self.repo.head.commits_list.append(new_head)
+        self.repo.head.commit = new_head
+        self.repo.git.rev_list_output = new_head.hexsha
+        self.tag_refs['1.1.0'] = _Tag('1.1.0', new_head)
+        self.assertEqual(self.get_reachable(), set(['1.0.1', '1.1.0']))
+        self.assertEqual(self.repo.git.options['rev_list'][-1],
+                         ('5' * 40, '^' + '4' * 40))
+
+    def test_index_is_rebuilt_for_other_branch(self):   # pylint: disable=invalid-name
+        """ Index is rebuilt if indexed HEAD isn't ancestor of HEAD"""
+        self.get_reachable()
+        self.repo.head = _Head(_Commit('6' * 40), [_Commit('e' * 40)])
+        self.repo.git.rev_list_output = '\n'.join(['6' * 40, 'e' * 40])
+        self.assertEqual(self.get_reachable(), set(['2.0.0']))
+        self.assertEqual(self.repo.git.options['rev_list'][-1], ('6' * 40,))
+
+    def test_commit_graph_delegates_to_git(self):   # pylint: disable=invalid-name
+        """ git uses own commit-graph for `git tag --merged`"""
+        _write_file(path.join(self.git_dir, 'objects', 'info',
+                              'commit-graph'), '')
+        self.repo.git.merged_tags = ['2.0.0']
+        self.assertEqual(self.get_reachable(), set(['2.0.0']))
+        self.assertFalse('rev_list' in self.repo.git.options)
+
+    def test_contains_sha(self):
+        """ Binary search into sorted array of SHAs"""
+        shas = b''.join(sorted(unhexlify(char * 40) for char in '13579'))
+        for char in '0123456789':
+            self.assertEqual(_contains_sha(shas, unhexlify(char * 40)),
+                             char in '13579')
+
+
+class MonorepoTests(TestCase):
+    """ Test versions of sub-projects with own version prefixes"""
+
+    def setUp(self):
+        head = _Commit('head')
+        head.tree = _Tree({'svc-a': 'a1', 'svc-b': 'b2'})
+        self.tag_commit = _Commit('tagged')
+        self.tag_commit.tree = _Tree({'svc-a': 'a1', 'svc-b': 'b1'})
+        self.repo = _Repo(
+            head=_Head(head, [self.tag_commit]),
+            tags=[_Tag('svc-a/v1.0.0', self.tag_commit),
+                  _Tag('svc-a/v1.1.0', _Commit('other')),
+                  _Tag('svc-b/v2.0.0', self.tag_commit),
+                  _Tag('1.0.0', self.tag_commit)],
+            merged_tags=['svc-a/v1.0.0', 'svc-b/v2.0.0', '1.0.0'])
+        self.repo.working_tree_dir = path.join(os.sep, 'repo')
+        self.repo.commit = lambda sha: self.tag_commit
+        self.subprojects = [('svc-a', 'svc-a/v', 'patch'),
+                            ('svc-b', 'svc-b/v', 'minor'),
+                            ('svc-c', 'svc-c/v', 'patch')]
+
+    def resolve(self, changed_only):
+        """ Resolve versions for test sub-projects"""
+        with patch("pybuilder_semver_git_tag._get_repo",
+                   return_value=self.repo):
+            return resolve_versions('/repo', self.subprojects, changed_only)
+
+    def test_dev_versions(self):
+        """ HEAD isn't tagged - all sub-projects get dev versions"""
+        self.assertEqual(
+            [result['version'] for result in self.resolve(False)],
+            ['1.0.1.dev', '2.1.0.dev', None])
+        self.assertEqual(self.repo.closed, True)
+
+    def test_changed_only(self):
+        """ Sub-project without changes since tag keeps release version"""
+        self.repo.dirty = False
+        results = self.resolve(True)
+        self.assertEqual([result['version'] for result in results],
+                         ['1.0.0', '2.1.0.dev', None])
+        self.assertEqual(results[0]['changed'], False)
+        self.assertEqual(self.repo.dirty_kwargs, {'path': 'svc-a'})
+
+    def test_release_versions(self):
+        """ Tagged HEAD gets release versions without prefixes"""
+        self.repo.head = _Head(self.tag_commit, [])
+        self.repo.dirty = False
+        results = self.resolve(False)
+        self.assertEqual([result['version'] for result in results],
+                         ['1.0.0', '2.0.0', None])
+        self.assertEqual([result['tag'] for result in results],
+                         ['svc-a/v1.0.0', 'svc-b/v2.0.0', None])
+
+    def test_changed_only_dirty(self):
+        """ Uncommitted changes into sub-project make dev version"""
+        self.repo.dirty = True
+        self.assertEqual(self.resolve(True)[0]['version'], '1.0.1.dev')
+
+    def test_incorrect_reachability(self):
+        """ Top-down search doesn't fit one pass for all prefixes"""
+        with self.assertRaises(BuildFailedException):
+            resolve_versions('/repo', self.subprojects,
+                             reachability='top-down')
+
+    def test_main(self):
+        """ Command line prints version per sub-project"""
+        with patch("pybuilder_semver_git_tag._get_repo",
+                   return_value=self.repo), \
+                patch("sys.stdout") as stdout_mock:
+            self.assertEqual(
+                monorepo_main(['-r', '/repo', '-p', 'svc-a', 'svc-a/v',
+                               'patch', '-p', 'svc-b', 'svc-b/v', 'major']),
+                0)
+        self.assertEqual(
+            [call[0][0] for call in stdout_mock.write.call_args_list],
+            ['svc-a\t1.0.1.dev\n', 'svc-b\t3.0.0.dev\n'])
+
+
+class BatchTests(TestCase):
+    """ Test resolution of many repositories without build"""
+
+    def setUp(self):
+        self.repo = _get_test_repo(merged_tags=['1.0.1', '1.0.4'])
+        self.repo.dirty = False
+
+    def get_repo(self, repo_path):
+        """ Only `/repo` is git repository"""
+        if repo_path != path.join(os.sep, 'repo'):
+            raise BuildFailedException(
+                "Directory `%s` isn't git repository root." % repo_path)
+        return self.repo
+
+    def test_resolve_repository(self):
+        """ Result contains version and details of resolution"""
+        with patch("pybuilder_semver_git_tag._get_repo", self.get_repo):
+            result = resolve_repository(path.join(os.sep, 'repo'))
+        self.assertEqual(result['name'], 'repo')
+        self.assertEqual(result['version'], '1.0.4')
+        self.assertEqual(result['tag'], '1.0.4')
+        self.assertEqual(result['sha'], 'shaforlastcommit')
+        self.assertEqual(result['dirty'], False)
+        self.assertEqual(result['source'], 'git')
+        self.assertEqual(result['error'], None)
+        self.assertTrue(self.repo.closed)
+
+    def test_resolve_repository_with_properties(self):  # pylint: disable=invalid-name
+        """ Properties are applied like `pyb -P`"""
+        self.repo.git.head_tags = []
+        self.repo.tags[1] = _Tag('1.0.4', _Commit('shaforthirdcommit'))
+        with patch("pybuilder_semver_git_tag._get_repo", self.get_repo):
+            result = resolve_repository(
+                path.join(os.sep, 'repo'),
+                {'semver_git_tag_increment_part': 'minor'})
+        self.assertEqual(result['version'], '1.1.0.dev')
+        self.assertEqual(result['dirty'], None)
+
+    def test_failed_repository_doesnt_stop_batch(self):  # pylint: disable=invalid-name
+        """ Errors are reported per repository"""
+        with patch("pybuilder_semver_git_tag._get_repo", self.get_repo):
+            results = list(resolve_repositories(
+                [path.join(os.sep, 'repo'), path.join(os.sep, 'other')],
+                jobs=2))
+        results.sort(key=lambda result: result['repo'])
+        self.assertTrue("isn't git repository" in results[0]['error'])
+        self.assertEqual(results[1]['version'], '1.0.4')
+
+    def test_main(self):
+        """ Command line prints JSON line per repository"""
+        with patch("pybuilder_semver_git_tag._get_repo", self.get_repo), \
+                patch("sys.stdout") as stdout_mock:
+            self.assertEqual(batch_main([path.join(os.sep, 'repo')]), 0)
+        self.assertEqual(
+            json.loads(stdout_mock.write.call_args[0][0])['version'],
+            '1.0.4')
+
+
+class FilesRefsBackendTests(_GitDirTestCase):
+    """ Test reading tags directly from refs files"""
+
+    def write_object(self, sha, content):
+        """ Write loose git object"""
+        object_file = path.join(self.git_dir, 'objects', sha[:2], sha[2:])
+        _write_file(object_file, '')
+        with open(object_file, 'wb') as object_content:
+            object_content.write(zlib.compress(content))
+
+    def setUp(self):
+        super(FilesRefsBackendTests, self).setUp()
+        _write_file(path.join(self.git_dir, 'packed-refs'),
+                    '# pack-refs with: peeled fully-peeled sorted \n'
+                    '%s refs/heads/other\n'
+                    '%s refs/tags/1.0.0\n'
+                    '%s refs/tags/1.1.0\n'
+                    '^%s\n'
+                    '%s refs/tags/1.2.3\n'
+                    % ('1' * 40, '2' * 40, '3' * 40, '4' * 40, '5' * 40))
+        # loose annotated tag with loose tag object
+        _write_file(path.join(self.git_dir, 'refs', 'tags', 'v', '2.0.0'),
+                    '6' * 40 + '\n')
+        self.write_object('6' * 40, b'tag 100\0object ' + b'7' * 40 +
+                          b'\ntype commit\ntag v/2.0.0\n')
+        self.write_object('7' * 40, b'commit 10\0tree ')
+        # loose annotated tag with packed tag object
+        _write_file(path.join(self.git_dir, 'refs', 'tags', '3.0.0'),
+                    '8' * 40 + '\n')
+
+    def test_read_tag_refs(self):
+        """ Packed refs with peeled lines and loose refs should be read"""
+        self.assertEqual(_read_tag_refs(self.git_dir), {
+            '1.0.0': ('2' * 40, '2' * 40),
+            '1.1.0': ('3' * 40, '4' * 40),
+            '1.2.3': (self.head_sha, None),
+            'v/2.0.0': ('6' * 40, None),
+            '3.0.0': ('8' * 40, None)})
+
+    def test_not_peeled_packed_refs(self):
+        """ Without `peeled` trait packed tags aren't peeled"""
+        _write_file(path.join(self.git_dir, 'packed-refs'),
+                    '%s refs/tags/1.0.0\n' % ('2' * 40))
+        self.assertEqual(_read_tag_refs(self.git_dir)['1.0.0'],
+                         ('2' * 40, None))
+
+    def test_get_info_with_files_backend(self):
+        """ Tags should be peeled from files and only packed objects
+            should be taken from git"""
+        repo = _Repo(head=_Head(_Commit(self.head_sha), []),
+                     merged_tags=['1.0.0', '1.1.0', '1.2.3', 'v/2.0.0',
+                                  '3.0.0'])
+        repo.peeled = {'8' * 40: '9' * 40, self.head_sha: self.head_sha}
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            tags, _, _ = _get_repo_info(
+                _RepoSession(self.repo_dir), '', 'merged', 'files')
+        self.assertEqual(
+            dict((tag.name, tag.commit) for tag in tags),
+            {'1.0.0': '2' * 40, '1.1.0': '4' * 40, '1.2.3': self.head_sha,
+             '3.0.0': '9' * 40})
+        # packed objects are peeled with one `git cat-file` process
+        self.assertEqual(len(repo.git.options['cat_file']), 1)
+
+    def test_batch_peel_size_and_fallback(self):    # pylint: disable=invalid-name
+        """ Batch size limits objects per process,
+            not peeled objects are taken by fallback"""
+        project = Project(self.repo_dir)
+        initialize_semver_git_tag(project)
+        project.set_property('semver_git_tag_refs_backend', 'files')
+        project.set_property('semver_git_tag_peel_batch_size', '1')
+        repo = _Repo(head=_Head(_Commit(self.head_sha), []),
+                     merged_tags=['1.2.3', '3.0.0'])
+        repo.peeled = {self.head_sha: self.head_sha}
+        repo.commit = Mock(return_value=_Commit('9' * 40))
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            set_version_from_git_tag(project, Mock())
+        self.assertEqual(project.version, '3.0.1.dev')
+        self.assertEqual(len(repo.git.options['cat_file']), 2)
+        repo.commit.assert_called_once_with('8' * 40)
+        project.set_property('semver_git_tag_peel_fallback', 'fail')
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            self.assertRaises(BuildFailedException, set_version_from_git_tag,
+                              project, Mock())
+
+    def test_single_peel_error(self):
+        """ GitPython errors of single object peeling should fail build"""
+        project = Project(self.repo_dir)
+        initialize_semver_git_tag(project)
+        project.set_property('semver_git_tag_refs_backend', 'files')
+        repo = _Repo(head=_Head(_Commit(self.head_sha), []),
+                     merged_tags=['3.0.0'])
+        repo.commit = Mock(side_effect=ValueError('not a commit'))
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            self.assertRaises(BuildFailedException, set_version_from_git_tag,
+                              project, Mock())
+        repo.commit.assert_called_once_with('8' * 40)
+
+    def test_get_info_with_files_backend_prefix(self):  # pylint: disable=invalid-name
+        """ Tags should be filtered with prefix before peeling"""
+        repo = _Repo(head=_Head(_Commit(self.head_sha), []),
+                     merged_tags=['1.0.0', 'v/2.0.0', '3.0.0'])
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            tags, _, _ = _get_repo_info(
+                _RepoSession(self.repo_dir), 'v/', 'merged', 'files')
+        self.assertEqual([(tag.name, tag.commit) for tag in tags],
+                         [('v/2.0.0', '7' * 40)])
+
+
+class TagIndexTests(_GitDirTestCase):
+    """ Test persistent incremental index of tag refs"""
+
+    def setUp(self):
+        super(TagIndexTests, self).setUp()
+        _write_file(path.join(self.git_dir, 'packed-refs'),
+                    '# pack-refs with: peeled fully-peeled sorted \n'
+                    '%s refs/tags/1.0.0\n'
+                    '%s refs/tags/1.10.0\n'
+                    '^%s\n'
+                    '%s refs/tags/deploy-1\n'
+                    % ('2' * 40, '3' * 40, '4' * 40, '5' * 40))
+        self.session = _RepoSession(self.repo_dir)
+
+    def get_index(self, version_prefix=''):
+        """ Refresh index like build does"""
+        self.session.metrics = _Metrics()
+        tag_index = _TagIndex(self.session, version_prefix)
+        tag_index.save()
+        return tag_index
+
+    def test_only_changed_refs_are_read(self):
+        """ Second build reads nothing, new tag is read alone"""
+        tag_index = self.get_index()
+        self.assertEqual(tag_index.candidates, ['1.10.0', '1.2.3', '1.0.0'])
+        self.assertEqual(self.session.metrics.counters['tag_refs_read'], 4)
+        self.assertEqual(tag_index.tags_count, 4)
+        tag_index = self.get_index()
+        self.assertEqual(self.session.metrics.counters['tag_refs_read'], 0)
+        self.assertFalse(tag_index.changed)
+        _write_file(path.join(self.git_dir, 'refs', 'tags', '1.3.0-rc.1'),
+                    'b' * 40 + '\n')
+        tag_index = self.get_index()
+        self.assertEqual(self.session.metrics.counters['tag_refs_read'], 1)
+        self.assertEqual(tag_index.candidates,
+                         ['1.10.0', '1.3.0-rc.1', '1.2.3', '1.0.0'])
+        self.assertEqual(tag_index.tag_refs, {
+            '1.0.0': ('2' * 40, '2' * 40),
+            '1.10.0': ('3' * 40, '4' * 40),
+            '1.2.3': (self.head_sha, None),
+            '1.3.0-rc.1': ('b' * 40, None)})
+        os.remove(path.join(self.git_dir, 'refs', 'tags', '1.2.3'))
+        self.assertEqual(self.get_index().candidates,
+                         ['1.10.0', '1.3.0-rc.1', '1.0.0'])
+
+    def test_peeled_commits_are_kept(self):
+        """ Peeled commits survive builds and `git pack-refs`"""
+        tag_index = self.get_index()
+        tag_index.set_peeled({'1.2.3': 'c' * 40})
+        tag_index.save()
+        self.assertEqual(self.get_index().tag_refs['1.2.3'],
+                         (self.head_sha, 'c' * 40))
+        os.remove(path.join(self.git_dir, 'refs', 'tags', '1.2.3'))
+        _write_file(path.join(self.git_dir, 'packed-refs'),
+                    '%s refs/tags/1.2.3\n' % self.head_sha)
+        tag_index = self.get_index()
+        self.assertEqual(tag_index.tag_refs, {
+            '1.2.3': (self.head_sha, 'c' * 40)})
+        self.assertEqual(tag_index.tags_count, 1)
+
+    def test_prefix_change_rebuilds_index(self):
+        """ Index is built for particular version prefix"""
+        self.get_index()
+        _write_file(path.join(self.git_dir, 'refs', 'tags', 'v2.0.0'),
+                    'b' * 40 + '\n')
+        self.assertEqual(self.get_index('v').candidates, ['v2.0.0'])
+        self.assertEqual(self.session.metrics.counters['tag_refs_read'], 5)
+
+    def test_repo_info_with_tag_index(self):
+        """ Reachable tags are taken from index, peeled commits
+            are taken from git once"""
+        repo = _Repo(head=_Head(_Commit(self.head_sha), []),
+                     merged_tags=['1.0.0', '1.2.3'])
+        repo.commit = Mock(return_value=_Commit(self.head_sha))
+        self.session.use_tag_index = True
+        with patch("pybuilder_semver_git_tag._get_repo", return_value=repo):
+            for _ in range(2):
+                tags, _, _ = _get_repo_info(self.session, '')
+                self.assertEqual(
+                    dict((tag.name, tag.commit) for tag in tags),
+                    {'1.0.0': '2' * 40, '1.2.3': self.head_sha})
+        repo.commit.assert_called_once_with(self.head_sha)
+        self.session.close()
+
+
+class ImportTimeTests(TestCase):
+    """ Benchmark of plugin import"""
+
+    @skipIf(sys.version_info < (3, 7), "-X importtime requires Python 3.7+")
+    def test_heavy_modules_not_imported(self):
+        """ GitPython shouldn't be imported with plugin"""
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        process = Popen([sys.executable, '-X', 'importtime', '-c',
+                         'import pybuilder_semver_git_tag'],
+                        stderr=PIPE, env=env)
+        _, stderr = process.communicate()
+        self.assertEqual(process.returncode, 0, stderr)
+        # import time: self [us] | cumulative | imported package
+        cumulative_times = {}
+        for line in stderr.decode('utf-8').splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[1].strip().isdigit():
+                cumulative_times[parts[2].strip()] = int(parts[1])
+        plugin_time = cumulative_times['pybuilder_semver_git_tag']
+        for module in ('git', 'semver'):
+            self.assertFalse(
+                module in cumulative_times,
+                "Module `%s` was imported with plugin: %s us of %s us"
+                % (module, cumulative_times.get(module), plugin_time))